@@ -0,0 +1,28 @@
+"""add user api key lookup index
+
+Revision ID: a41f29c6d8b3
+Revises: c8d5570adaeb
+Create Date: 2026-08-27 09:12:41.207355
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'a41f29c6d8b3'
+down_revision = 'c8d5570adaeb'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_userapikey_lookup',
+        'user_api_keys',
+        ['user_id', 'provider', 'is_active', 'is_validated'],
+        unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_userapikey_lookup', table_name='user_api_keys')
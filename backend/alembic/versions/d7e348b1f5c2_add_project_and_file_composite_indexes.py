@@ -0,0 +1,35 @@
+"""add project and file composite indexes
+
+Revision ID: d7e348b1f5c2
+Revises: a41f29c6d8b3
+Create Date: 2026-08-27 15:28:09.644182
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'd7e348b1f5c2'
+down_revision = 'a41f29c6d8b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_project_owner_id',
+        'projects',
+        ['owner_id', 'id'],
+        unique=False
+    )
+    op.create_index(
+        'ix_file_project_id',
+        'files',
+        ['project_id', 'id'],
+        unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_file_project_id', table_name='files')
+    op.drop_index('ix_project_owner_id', table_name='projects')
@@ -1,6 +1,8 @@
 """
 Main FastAPI application entry point for Lumnicode.
 """
+import asyncio
+
 import uvicorn
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
@@ -10,6 +12,16 @@ from src.config import settings
 from src.services.storage_service import storage_service
 import logging
 
+# uvloop ships with uvicorn[standard] and uvicorn's "auto" loop already
+# prefers it; installing the policy here makes the faster loop apply to
+# any other entry point that imports this app (scripts, test harnesses).
+# It is not available on Windows, so a missing import is fine.
+try:
+    import uvloop
+    uvloop.install()
+except ImportError:
+    pass
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -58,6 +70,51 @@ async def startup_event():
     except Exception as e:
         logger.warning("S3 health check failed: %s", e)
 
+    # The global service is handed out by dependency injection without
+    # entering its async context, so build its shared HTTP client here.
+    from src.services.multi_provider_ai_service import multi_provider_ai_service
+    await multi_provider_ai_service.startup()
+
+    # The legacy AIService global is handed out the same way; its session
+    # must exist before the warmup below can reach the model.
+    from src.services.ai_service import ai_service
+    await ai_service.startup()
+
+    # Warm the project-generation cache in the background; failures are
+    # non-fatal (e.g. no provider key configured yet). The reference is
+    # kept on app.state because the loop only holds the task weakly.
+    app.state.warmup_task = asyncio.create_task(
+        ai_service.project_generator.warmup_cache()
+    )
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Flush buffered state and close shared HTTP clients."""
+    from src.db.database import SessionLocal
+    from src.services.ai_service import ai_service
+    from src.services.api_key_manager import APIKeyManager
+    from src.services.api_key_validator import api_key_validator
+    from src.services.auth import clerk_auth
+    from src.services.multi_provider_ai_service import multi_provider_ai_service
+
+    warmup_task = getattr(app.state, "warmup_task", None)
+    if warmup_task is not None and not warmup_task.done():
+        warmup_task.cancel()
+
+    # Usage increments are batched in memory; write out the tail so the
+    # last partial batch survives the process exit.
+    db = SessionLocal()
+    try:
+        APIKeyManager(db).flush_usage()
+    finally:
+        db.close()
+
+    await api_key_validator.close()
+    await clerk_auth.close()
+    await multi_provider_ai_service.close()
+    await ai_service.close()
+
 
 @app.get("/")
 async def root():
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Request
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime
@@ -7,7 +7,7 @@ from pydantic import BaseModel
 
 from src.db.database import get_db
 from src.services.auth import get_current_user
-from src.services.database import get_user_by_clerk_id, create_user
+from src.services.database import get_user_by_clerk_id_cached, create_user
 from src.models.models import User, Project
 from src.services.ai_generation_service import ai_generation_service
 from src.api.websocket import get_ai_session, create_ai_session
@@ -17,12 +17,15 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-async def get_current_db_user(
+def get_current_db_user(
+    request: Request,
     current_user: dict = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get current user from database, create if doesn't exist."""
-    db_user = get_user_by_clerk_id(db, current_user["clerk_id"])
+    db_user = get_user_by_clerk_id_cached(
+        db, current_user["clerk_id"], request.state
+    )
     if not db_user:
         # Create user if they don't exist in our database
         user_create = UserCreate(
@@ -2,13 +2,13 @@
 AI assistance endpoint using unified LLM provider.
 """
 import logging
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
 from langchain_core.messages import HumanMessage, SystemMessage
 
 from src.db.database import get_db
 from src.services.auth import get_current_user
-from src.services.database import get_user_by_clerk_id, create_user
+from src.services.database import get_user_by_clerk_id_cached, create_user
 from src.schemas.schemas import AssistRequest, AssistResponse, UserCreate
 from src.services.llm_provider import get_user_chat_model
 
@@ -17,11 +17,14 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
-async def get_current_db_user(
+def get_current_db_user(
+    request: Request,
     current_user: dict = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    db_user = get_user_by_clerk_id(db, current_user["clerk_id"])
+    db_user = get_user_by_clerk_id_cached(
+        db, current_user["clerk_id"], request.state
+    )
     if not db_user:
         user_create = UserCreate(
             clerk_id=current_user["clerk_id"],
@@ -1,23 +1,28 @@
 """
 Authentication endpoints.
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Request
 from sqlalchemy.orm import Session
 from src.db.database import get_db
 from src.services.auth import get_current_user
-from src.services.database import get_user_by_clerk_id, create_user
+from src.services.database import get_user_by_clerk_id_cached, create_user
 from src.schemas.schemas import User, UserCreate
 
 router = APIRouter()
 
 
+# Sync on purpose: runs in the threadpool so the sync Session doesn't
+# block the event loop.
 @router.get("/me", response_model=User)
-async def get_current_user_info(
+def get_current_user_info(
+    request: Request,
     current_user: dict = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get current user information."""
-    db_user = get_user_by_clerk_id(db, current_user["clerk_id"])
+    db_user = get_user_by_clerk_id_cached(
+        db, current_user["clerk_id"], request.state
+    )
     
     if not db_user:
         # Create user if they don't exist in our database
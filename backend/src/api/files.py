@@ -9,7 +9,7 @@ from uuid import UUID
 from src.db.database import get_db
 from src.services.auth import get_current_user
 from src.services.database import (
-    get_user_by_clerk_id,
+    get_user_by_clerk_id_cached,
     get_files_by_project,
     get_file_by_id,
     create_file,
@@ -25,12 +25,19 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
-async def get_current_db_user(
+def get_current_db_user(
+    request: Request,
     current_user: dict = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Get current user from database, create if doesn't exist."""
-    db_user = get_user_by_clerk_id(db, current_user["clerk_id"])
+    """Get current user from database, create if doesn't exist.
+
+    Sync on purpose so FastAPI resolves it in the threadpool instead of
+    blocking the event loop on the Session queries.
+    """
+    db_user = get_user_by_clerk_id_cached(
+        db, current_user["clerk_id"], request.state
+    )
     if not db_user:
         user_create = UserCreate(
             clerk_id=current_user["clerk_id"],
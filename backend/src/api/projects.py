@@ -1,14 +1,14 @@
 """
 Project management endpoints.
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Request
 from sqlalchemy.orm import Session
 from typing import List
 from uuid import UUID
 from src.db.database import get_db
 from src.services.auth import get_current_user
 from src.services.database import (
-    get_user_by_clerk_id,
+    get_user_by_clerk_id_cached,
     get_projects_by_user,
     get_project_by_id,
     create_project,
@@ -21,12 +21,18 @@ from src.schemas.schemas import Project, ProjectCreate, ProjectUpdate, UserCreat
 router = APIRouter()
 
 
-async def get_current_db_user(
+# Handlers here are plain `def` on purpose: the CRUD layer uses the sync
+# SQLAlchemy Session, and FastAPI runs sync endpoints/dependencies in its
+# threadpool, keeping DB round trips off the event loop.
+def get_current_db_user(
+    request: Request,
     current_user: dict = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get current user from database, create if doesn't exist."""
-    db_user = get_user_by_clerk_id(db, current_user["clerk_id"])
+    db_user = get_user_by_clerk_id_cached(
+        db, current_user["clerk_id"], request.state
+    )
     if not db_user:
         # Create user if they don't exist in our database
         user_create = UserCreate(
@@ -40,7 +46,7 @@ async def get_current_db_user(
 
 
 @router.get("/", response_model=List[Project])
-async def get_projects(
+def get_projects(
     db: Session = Depends(get_db),
     current_user = Depends(get_current_db_user)
 ):
@@ -49,7 +55,7 @@ async def get_projects(
 
 
 @router.post("/", response_model=Project, status_code=status.HTTP_201_CREATED)
-async def create_new_project(
+def create_new_project(
     project: ProjectCreate,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_db_user)
@@ -59,7 +65,7 @@ async def create_new_project(
 
 
 @router.get("/{project_id}", response_model=Project)
-async def get_project(
+def get_project(
     project_id: UUID,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_db_user)
@@ -75,7 +81,7 @@ async def get_project(
 
 
 @router.put("/{project_id}", response_model=Project)
-async def update_project_info(
+def update_project_info(
     project_id: UUID,
     project_update: ProjectUpdate,
     db: Session = Depends(get_db),
@@ -92,7 +98,7 @@ async def update_project_info(
 
 
 @router.delete("/{project_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_project_endpoint(
+def delete_project_endpoint(
     project_id: UUID,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_db_user)
@@ -6,7 +6,7 @@ import uuid
 import enum
 from sqlalchemy import (
     Column, Integer, String, Text, DateTime,
-    ForeignKey, Boolean, Enum, UniqueConstraint
+    ForeignKey, Boolean, Enum, Index, UniqueConstraint
 )
 from sqlalchemy.dialects.postgresql import UUID, JSON
 from sqlalchemy.orm import relationship
@@ -86,6 +86,9 @@ class UserAPIKey(Base):
 
     __table_args__ = (
         UniqueConstraint("user_id", "provider", "display_name", name="uq_user_provider_name"),
+        # Matches the get_available_api_key predicate so the lookup is a
+        # single index probe instead of a per-user scan.
+        Index("ix_userapikey_lookup", "user_id", "provider", "is_active", "is_validated"),
     )
 
 
@@ -118,6 +121,12 @@ class Project(Base):
     members = relationship("ProjectMember", back_populates="project", cascade="all, delete-orphan")
     snapshots = relationship("ProjectSnapshot", back_populates="project", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # Covers both the per-user listing and the (id, owner_id) ownership
+        # checks in the CRUD layer.
+        Index("ix_project_owner_id", "owner_id", "id"),
+    )
+
 
 # --------------------------
 # PROJECT MEMBERSHIP
@@ -165,6 +174,8 @@ class File(Base):
 
     __table_args__ = (
         UniqueConstraint("project_id", "path", name="uq_project_file_path"),
+        # Per-project file listings and ownership-scoped file lookups.
+        Index("ix_file_project_id", "project_id", "id"),
     )
 
 
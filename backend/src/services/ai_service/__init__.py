@@ -40,8 +40,23 @@ class AIService:
         self.github_service = GitHubService()
         self.project_generator = ProjectGenerator(self)
 
+    async def startup(self):
+        """Build the shared HTTP session eagerly; called from app startup.
+
+        The global instance is handed out without entering its async
+        context, so the session has to be created here for direct model
+        calls (e.g. the project-generation cache warmup) to work.
+        """
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession()
+
+    async def close(self):
+        """Close the shared HTTP session."""
+        if self.session and not self.session.closed:
+            await self.session.close()
+
     async def __aenter__(self):
-        self.session = aiohttp.ClientSession()
+        await self.startup()
         await self.deployment_service.__aenter__()
         await self.github_service.__aenter__()
         return self
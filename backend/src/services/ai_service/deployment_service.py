@@ -2,8 +2,11 @@
 Deployment service for automated deployment to various platforms.
 """
 import asyncio
+import base64
 import json
 import os
+import re
+import types
 from typing import Dict, List, Optional, Any, Tuple
 from enum import Enum
 import logging
@@ -11,6 +14,18 @@ import aiohttp
 
 logger = logging.getLogger(__name__)
 
+# Directories and file patterns that should never be uploaded to a platform.
+# Precompiled at module load so the tree walk only does set/regex lookups.
+_SKIP_DIRS = frozenset({
+    '.git', 'node_modules', '__pycache__', '.next', 'dist', 'build',
+    '.venv', 'venv', '.pytest_cache', '.mypy_cache'
+})
+_SKIP_FILE_RE = re.compile(r'\.(pyc|pyo|so|o|class|log)$')
+
+
+class DeploymentError(Exception):
+    """Raised when a platform API call fails."""
+
 
 class DeploymentPlatform(Enum):
     """Supported deployment platforms."""
@@ -33,28 +48,42 @@ class DeploymentStatus(Enum):
     CANCELLED = "cancelled"
 
 
+# Platform list never changes at runtime; build it once instead of
+# re-enumerating the Enum on every call.
+_SUPPORTED_PLATFORMS = tuple(platform.value for platform in DeploymentPlatform)
+
+# Hard-coded platform metadata, shared read-only across all instances.
+_PLATFORM_CONFIGS = types.MappingProxyType({
+    DeploymentPlatform.VERCEL: {
+        "api_url": "https://api.vercel.com",
+        "token_env": "VERCEL_TOKEN"
+    },
+    DeploymentPlatform.NETLIFY: {
+        "api_url": "https://api.netlify.com/api/v1",
+        "token_env": "NETLIFY_TOKEN"
+    },
+    DeploymentPlatform.RAILWAY: {
+        "api_url": "https://backboard.railway.app/graphql/v2",
+        "token_env": "RAILWAY_TOKEN"
+    }
+})
+
+
 class DeploymentService:
     """Service for automated deployment to various platforms."""
 
     def __init__(self):
         self.session = None
-        self.platform_configs = {
-            DeploymentPlatform.VERCEL: {
-                "api_url": "https://api.vercel.com",
-                "token_env": "VERCEL_TOKEN"
-            },
-            DeploymentPlatform.NETLIFY: {
-                "api_url": "https://api.netlify.com/api/v1",
-                "token_env": "NETLIFY_TOKEN"
-            },
-            DeploymentPlatform.RAILWAY: {
-                "api_url": "https://backboard.railway.app/graphql/v2",
-                "token_env": "RAILWAY_TOKEN"
-            }
+        self.platform_configs = _PLATFORM_CONFIGS
+        # Tokens are process-constant; resolve them once instead of hitting
+        # os.environ on every deployment/status call.
+        self._tokens = {
+            platform: os.getenv(config["token_env"])
+            for platform, config in self.platform_configs.items()
         }
 
     async def __aenter__(self):
-        self.session = aiohttp.ClientSession()
+        self.session = aiohttp.ClientSession(raise_for_status=True)
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
@@ -70,7 +99,7 @@ class DeploymentService:
         """Deploy a project to the specified platform."""
 
         if not self.session:
-            self.session = aiohttp.ClientSession()
+            self.session = aiohttp.ClientSession(raise_for_status=True)
 
         try:
             if platform == DeploymentPlatform.VERCEL:
@@ -96,7 +125,7 @@ class DeploymentService:
     ) -> Dict[str, Any]:
         """Deploy to Vercel."""
 
-        token = os.getenv("VERCEL_TOKEN")
+        token = self._tokens[DeploymentPlatform.VERCEL]
         if not token:
             raise ValueError("VERCEL_TOKEN environment variable not set")
 
@@ -119,23 +148,25 @@ class DeploymentService:
             }
         }
 
-        async with self.session.post(
-            "https://api.vercel.com/v1/deployments",
-            headers=headers,
-            json=deploy_data
-        ) as response:
-            if response.status == 200:
+        try:
+            async with self.session.post(
+                "https://api.vercel.com/v1/deployments",
+                headers=headers,
+                json=deploy_data
+            ) as response:
                 result = await response.json()
-                return {
-                    "status": DeploymentStatus.SUCCESS.value,
-                    "platform": "vercel",
-                    "url": result.get("url"),
-                    "deployment_id": result.get("id"),
-                    "build_logs": result.get("build", {}).get("logs", [])
-                }
-            else:
-                error = await response.text()
-                raise Exception(f"Vercel deployment failed: {error}")
+        except aiohttp.ClientResponseError as e:
+            raise DeploymentError(
+                f"Vercel deployment failed: {e.status} {e.message}"
+            ) from e
+
+        return {
+            "status": DeploymentStatus.SUCCESS.value,
+            "platform": "vercel",
+            "url": result.get("url"),
+            "deployment_id": result.get("id"),
+            "build_logs": result.get("build", {}).get("logs", [])
+        }
 
     async def _deploy_to_netlify(
         self,
@@ -144,7 +175,7 @@ class DeploymentService:
     ) -> Dict[str, Any]:
         """Deploy to Netlify."""
 
-        token = os.getenv("NETLIFY_TOKEN")
+        token = self._tokens[DeploymentPlatform.NETLIFY]
         if not token:
             raise ValueError("NETLIFY_TOKEN environment variable not set")
 
@@ -153,48 +184,61 @@ class DeploymentService:
             "Content-Type": "application/json"
         }
 
+        # File prep is independent of site creation, so start it first and
+        # let the encoding work overlap the site-creation round trip.
+        files_task = asyncio.create_task(
+            self._prepare_files_for_deployment(project_path)
+        )
+
         # Create site first
         site_data = {
             "name": config.get("name", "lumni-project") if config else "lumni-project"
         }
 
-        async with self.session.post(
-            "https://api.netlify.com/api/v1/sites",
-            headers=headers,
-            json=site_data
-        ) as response:
-            if response.status != 201:
-                error = await response.text()
-                raise Exception(f"Failed to create Netlify site: {error}")
-
-            site = await response.json()
-            site_id = site["id"]
+        try:
+            async with self.session.post(
+                "https://api.netlify.com/api/v1/sites",
+                headers=headers,
+                json=site_data
+            ) as response:
+                site = await response.json()
+                site_id = site["id"]
+        except aiohttp.ClientResponseError as e:
+            files_task.cancel()
+            raise DeploymentError(
+                f"Failed to create Netlify site: {e.status} {e.message}"
+            ) from e
+        except Exception:
+            files_task.cancel()
+            raise
 
         # Deploy files
-        files = await self._prepare_files_for_deployment(project_path)
+        files = await files_task
 
         deploy_data = {
             "files": files,
             "draft": False
         }
 
-        async with self.session.post(
-            f"https://api.netlify.com/api/v1/sites/{site_id}/deploys",
-            headers=headers,
-            json=deploy_data
-        ) as response:
-            if response.status == 200:
+        try:
+            async with self.session.post(
+                f"https://api.netlify.com/api/v1/sites/{site_id}/deploys",
+                headers=headers,
+                json=deploy_data
+            ) as response:
                 result = await response.json()
-                return {
-                    "status": DeploymentStatus.SUCCESS.value,
-                    "platform": "netlify",
-                    "url": result.get("url"),
-                    "site_id": site_id,
-                    "deploy_id": result.get("id")
-                }
-            else:
-                error = await response.text()
-                raise Exception(f"Netlify deployment failed: {error}")
+        except aiohttp.ClientResponseError as e:
+            raise DeploymentError(
+                f"Netlify deployment failed: {e.status} {e.message}"
+            ) from e
+
+        return {
+            "status": DeploymentStatus.SUCCESS.value,
+            "platform": "netlify",
+            "url": result.get("url"),
+            "site_id": site_id,
+            "deploy_id": result.get("id")
+        }
 
     async def _deploy_to_railway(
         self,
@@ -203,7 +247,7 @@ class DeploymentService:
     ) -> Dict[str, Any]:
         """Deploy to Railway."""
 
-        token = os.getenv("RAILWAY_TOKEN")
+        token = self._tokens[DeploymentPlatform.RAILWAY]
         if not token:
             raise ValueError("RAILWAY_TOKEN environment variable not set")
 
@@ -232,23 +276,25 @@ class DeploymentService:
             "teamId": config.get("team_id") if config else None
         }
 
-        async with self.session.post(
-            "https://backboard.railway.app/graphql/v2",
-            headers=headers,
-            json={
-                "query": create_project_query,
-                "variables": {"input": project_input}
-            }
-        ) as response:
-            if response.status != 200:
-                error = await response.text()
-                raise Exception(f"Failed to create Railway project: {error}")
+        try:
+            async with self.session.post(
+                "https://backboard.railway.app/graphql/v2",
+                headers=headers,
+                json={
+                    "query": create_project_query,
+                    "variables": {"input": project_input}
+                }
+            ) as response:
+                result = await response.json()
+        except aiohttp.ClientResponseError as e:
+            raise DeploymentError(
+                f"Failed to create Railway project: {e.status} {e.message}"
+            ) from e
 
-            result = await response.json()
-            if result.get("errors"):
-                raise Exception(f"Railway API error: {result['errors']}")
+        if result.get("errors"):
+            raise DeploymentError(f"Railway API error: {result['errors']}")
 
-            project_id = result["data"]["projectCreate"]["project"]["id"]
+        project_id = result["data"]["projectCreate"]["project"]["id"]
 
         return {
             "status": DeploymentStatus.SUCCESS.value,
@@ -262,24 +308,36 @@ class DeploymentService:
 
         files = {}
 
-        # Walk through project directory
-        for root, dirs, filenames in os.walk(project_path):
-            # Skip common directories
-            dirs[:] = [d for d in dirs if d not in ['.git', 'node_modules', '__pycache__', '.next']]
-
-            for filename in filenames:
-                filepath = os.path.join(root, filename)
-                relative_path = os.path.relpath(filepath, project_path)
-
-                try:
-                    with open(filepath, 'r', encoding='utf-8') as f:
-                        content = f.read()
+        # Iterative scandir walk: DirEntry caches is_dir(), avoiding a stat()
+        # per entry that os.walk would incur.
+        stack = [project_path]
+        while stack:
+            current = stack.pop()
+            try:
+                entries = os.scandir(current)
+            except OSError as e:
+                logger.warning(f"Skipping directory {current}: {e}")
+                continue
+
+            with entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name not in _SKIP_DIRS:
+                            stack.append(entry.path)
+                        continue
+
+                    if _SKIP_FILE_RE.search(entry.name):
+                        continue
+
+                    relative_path = os.path.relpath(entry.path, project_path)
+                    try:
+                        with open(entry.path, 'r', encoding='utf-8') as f:
+                            content = f.read()
                         # Convert to base64 for API
-                        import base64
                         files[relative_path] = base64.b64encode(content.encode()).decode()
-                except (UnicodeDecodeError, OSError) as e:
-                    logger.warning(f"Skipping file {filepath}: {e}")
-                    continue
+                    except (UnicodeDecodeError, OSError) as e:
+                        logger.warning(f"Skipping file {entry.path}: {e}")
+                        continue
 
         return files
 
@@ -291,7 +349,7 @@ class DeploymentService:
         """Get deployment status."""
 
         if not self.session:
-            self.session = aiohttp.ClientSession()
+            self.session = aiohttp.ClientSession(raise_for_status=True)
 
         try:
             if platform == DeploymentPlatform.VERCEL:
@@ -307,45 +365,47 @@ class DeploymentService:
     async def _get_vercel_status(self, deployment_id: str) -> Dict[str, Any]:
         """Get Vercel deployment status."""
 
-        token = os.getenv("VERCEL_TOKEN")
+        token = self._tokens[DeploymentPlatform.VERCEL]
         headers = {"Authorization": f"Bearer {token}"}
 
-        async with self.session.get(
-            f"https://api.vercel.com/v1/deployments/{deployment_id}",
-            headers=headers
-        ) as response:
-            if response.status == 200:
+        try:
+            async with self.session.get(
+                f"https://api.vercel.com/v1/deployments/{deployment_id}",
+                headers=headers
+            ) as response:
                 result = await response.json()
-                return {
-                    "status": result.get("status", "unknown"),
-                    "url": result.get("url"),
-                    "build_logs": result.get("build", {}).get("logs", [])
-                }
-            else:
-                return {"status": "error"}
+        except aiohttp.ClientResponseError:
+            return {"status": "error"}
+
+        return {
+            "status": result.get("status", "unknown"),
+            "url": result.get("url"),
+            "build_logs": result.get("build", {}).get("logs", [])
+        }
 
     async def _get_netlify_status(self, deploy_id: str) -> Dict[str, Any]:
         """Get Netlify deployment status."""
 
-        token = os.getenv("NETLIFY_TOKEN")
+        token = self._tokens[DeploymentPlatform.NETLIFY]
         headers = {"Authorization": f"Bearer {token}"}
 
-        async with self.session.get(
-            f"https://api.netlify.com/api/v1/deploys/{deploy_id}",
-            headers=headers
-        ) as response:
-            if response.status == 200:
+        try:
+            async with self.session.get(
+                f"https://api.netlify.com/api/v1/deploys/{deploy_id}",
+                headers=headers
+            ) as response:
                 result = await response.json()
-                return {
-                    "status": result.get("state", "unknown"),
-                    "url": result.get("url")
-                }
-            else:
-                return {"status": "error"}
+        except aiohttp.ClientResponseError:
+            return {"status": "error"}
+
+        return {
+            "status": result.get("state", "unknown"),
+            "url": result.get("url")
+        }
 
     def get_supported_platforms(self) -> List[str]:
         """Get list of supported deployment platforms."""
-        return [platform.value for platform in DeploymentPlatform]
+        return list(_SUPPORTED_PLATFORMS)
 
     def get_platform_config(self, platform: DeploymentPlatform) -> Dict[str, str]:
         """Get configuration for a platform."""
@@ -0,0 +1,163 @@
+"""
+In-process response caches for low-temperature LLM calls.
+"""
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Optional
+
+# Only near-deterministic calls are safe to replay from cache.
+CACHEABLE_TEMPERATURE = 0.2
+
+# Minimum Jaccard similarity between prompt line sets for a fuzzy hit.
+SIMILARITY_THRESHOLD = 0.92
+
+
+class LLMCache:
+    """Exact-match LRU cache with TTL for LLM responses.
+
+    Keys are derived from the full prompt, model and temperature, so a hit
+    is guaranteed to correspond to an identical request.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 3600.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+
+    @staticmethod
+    def make_key(
+        system_prompt: str,
+        user_prompt: str,
+        model: str,
+        temperature: float
+    ) -> str:
+        """Build a stable cache key for a chat completion request."""
+        payload = json.dumps(
+            {
+                "sys": system_prompt,
+                "usr": user_prompt,
+                "model": model,
+                "t": temperature
+            },
+            sort_keys=True
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    @staticmethod
+    def make_messages_key(
+        messages: list,
+        model: str,
+        temperature: float
+    ) -> str:
+        """Build a stable cache key from a full message list."""
+        payload = json.dumps(
+            {
+                "messages": messages,
+                "model": model,
+                "t": temperature
+            },
+            sort_keys=True
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response for key, or None if absent/expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, response = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return response
+
+    def set(self, key: str, response: str) -> None:
+        """Store a response, evicting the least recently used entry if full."""
+        self._entries[key] = (time.monotonic() + self.ttl, response)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+
+class NearDuplicateCache:
+    """Fuzzy response cache for near-identical prompts.
+
+    Approximates an embedding-based semantic cache without an embedding
+    call or vector index: each prompt is reduced to the set of its hashed
+    non-blank lines and candidates are compared by Jaccard similarity.
+    That directly captures the edit-one-line-and-reanalyze workflow this
+    cache targets, where the prompt differs by a handful of lines.
+
+    Similarity alone cannot distinguish what was asked *about* the code:
+    on a large file, the instruction lines are diluted below any
+    threshold by the shared code lines. Every entry therefore also
+    carries an exact ``scope`` (caller identity, operation and its
+    parameters) and only entries with an identical scope are compared.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 128,
+        ttl: float = 3600.0,
+        threshold: float = SIMILARITY_THRESHOLD
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.threshold = threshold
+        self._entries: OrderedDict[
+            int, tuple[float, tuple, frozenset, str]
+        ] = OrderedDict()
+        self._next_id = 0
+
+    @staticmethod
+    def _signature(text: str) -> frozenset:
+        return frozenset(
+            hash(line) for line in text.splitlines() if line.strip()
+        )
+
+    def get(self, text: str, scope: tuple) -> Optional[str]:
+        """Return the most similar fresh entry with an identical scope."""
+        signature = self._signature(text)
+        if not signature:
+            return None
+
+        now = time.monotonic()
+        best_key = None
+        best_score = self.threshold
+        for key, (expires_at, entry_scope, entry_sig, _) in list(
+            self._entries.items()
+        ):
+            if expires_at < now:
+                del self._entries[key]
+                continue
+            if entry_scope != scope:
+                continue
+            intersection = len(signature & entry_sig)
+            if not intersection:
+                continue
+            score = intersection / len(signature | entry_sig)
+            if score >= best_score:
+                best_key = key
+                best_score = score
+
+        if best_key is None:
+            return None
+        self._entries.move_to_end(best_key)
+        return self._entries[best_key][3]
+
+    def set(self, text: str, response: str, scope: tuple) -> None:
+        """Store a response under the prompt's line signature and scope."""
+        signature = self._signature(text)
+        if not signature:
+            return
+        self._entries[self._next_id] = (
+            time.monotonic() + self.ttl, scope, signature, response
+        )
+        self._next_id += 1
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
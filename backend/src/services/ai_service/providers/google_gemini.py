@@ -0,0 +1,76 @@
+"""
+Google Gemini provider with per-key client reuse.
+"""
+import asyncio
+import hashlib
+
+from google import genai
+from google.genai import types
+
+_DEFAULT_MODEL = "gemini-2.5-flash"
+
+# Gemini free-tier RPM limits are low; keep batched fan-out modest.
+_MAX_CONCURRENT_REQUESTS = 8
+
+
+class GeminiProvider:
+    """Wraps google-genai with cached per-key clients.
+
+    Each ``genai.Client`` carries its own API key and connection pool, so
+    keys from different users never share auth state; caching the client
+    per key keeps the underlying connections alive across requests
+    instead of rebuilding them every call.
+    """
+
+    _clients: dict[str, genai.Client] = {}
+
+    def __init__(self, api_key: str, model_name: str = _DEFAULT_MODEL):
+        self.api_key = api_key
+        self.model_name = model_name
+
+    def _get_client(self) -> genai.Client:
+        cache_key = hashlib.sha256(self.api_key.encode()).hexdigest()
+        client = GeminiProvider._clients.get(cache_key)
+        if client is None:
+            client = genai.Client(api_key=self.api_key)
+            GeminiProvider._clients[cache_key] = client
+        return client
+
+    def generate_text(self, prompt: str, max_output_tokens: int = 1024) -> str:
+        """Generate a single completion for a prompt."""
+        response = self._get_client().models.generate_content(
+            model=self.model_name,
+            contents=prompt,
+            config=types.GenerateContentConfig(
+                max_output_tokens=max_output_tokens
+            )
+        )
+        return response.text
+
+    async def generate_batch(
+        self,
+        prompts: list[str],
+        max_output_tokens: int = 1024
+    ) -> list[str]:
+        """Generate completions for several prompts concurrently."""
+        client = self._get_client()
+        config = types.GenerateContentConfig(
+            max_output_tokens=max_output_tokens
+        )
+        semaphore = asyncio.Semaphore(_MAX_CONCURRENT_REQUESTS)
+
+        async def _one(prompt: str) -> str:
+            async with semaphore:
+                response = await client.aio.models.generate_content(
+                    model=self.model_name,
+                    contents=prompt,
+                    config=config
+                )
+                return response.text
+
+        return await asyncio.gather(*(_one(prompt) for prompt in prompts))
+
+
+def generate_text(prompt: str, api_key: str, max_output_tokens: int = 1024) -> str:
+    """Backward-compatible helper mirroring the old module function."""
+    return GeminiProvider(api_key).generate_text(prompt, max_output_tokens)
@@ -1,23 +1,62 @@
 """
 API Key Management Service for user API keys.
 """
+import asyncio
 import logging
-from typing import List, Optional, Dict, Any
+import time
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, func
-from datetime import datetime, timedelta
+from sqlalchemy import and_, case, delete, func, select, update
+from datetime import datetime, timedelta, timezone
 
 from src.models.models import UserAPIKey, ProviderEnum, User
 from src.services.api_key_validator import get_api_key_validator, ValidationResult
 
 logger = logging.getLogger(__name__)
 
+# Usage increments are buffered and flushed as one bulk UPDATE once either
+# bound is reached, amortizing the per-call SELECT+UPDATE+COMMIT round trip.
+_USAGE_FLUSH_THRESHOLD = 64
+_USAGE_FLUSH_INTERVAL = 2.0  # seconds
+
+# Available-key lookups rarely change (only on add/deactivate/delete), so a
+# short TTL cache turns the per-AI-call filtered SELECT into a PK fetch that
+# the session identity map can serve.
+_KEY_CACHE_TTL = 30.0  # seconds
+_KEY_CACHE_MAXSIZE = 4096
+
 
 class APIKeyManager:
     """Manages user API keys with validation and usage tracking."""
-    
+
+    # Shared across instances so per-request managers still batch together.
+    _pending_usage: Dict[str, int] = defaultdict(int)
+    _pending_count: Dict[str, int] = defaultdict(int)
+    _last_usage_flush: float = time.monotonic()
+
+    # Maps (user_id, provider value) -> (expiry, key primary key).
+    _key_cache: Dict[tuple, tuple] = {}
+
+    # Callbacks fired with the user_id whenever that user's keys change,
+    # so services caching per-user key state can drop their entries.
+    _mutation_hooks: List[Callable[[int], None]] = []
+
     def __init__(self, db: Session):
         self.db = db
+
+    @classmethod
+    def register_mutation_hook(cls, hook: Callable[[int], None]) -> None:
+        """Register a callback invoked after a user's keys are mutated."""
+        cls._mutation_hooks.append(hook)
+
+    @classmethod
+    def _notify_mutation(cls, user_id: int) -> None:
+        for hook in cls._mutation_hooks:
+            try:
+                hook(user_id)
+            except Exception as e:
+                logger.warning(f"Key mutation hook failed: {e}")
     
     async def add_api_key(
         self, 
@@ -27,11 +66,14 @@ class APIKeyManager:
         display_name: Optional[str] = None
     ) -> Dict[str, Any]:
         """Add a new API key for a user."""
+        now = datetime.now(timezone.utc)
         try:
             # Validate the API key first
             validator = await get_api_key_validator()
             async with validator:
-                validation_result = await validator.validate_key(provider, api_key)
+                validation_result = await validator.validate_key(
+                    provider, api_key, need_quota=True
+                )
             
             if not validation_result.is_valid:
                 return {
@@ -49,11 +91,15 @@ class APIKeyManager:
             ).first()
             
             if existing_key:
-                # Update existing key
+                # Update existing key; drop the cached validation of the
+                # value being rotated out.
+                await validator.invalidate(provider, existing_key.api_key)
                 existing_key.api_key = api_key
                 existing_key.is_validated = True
-                existing_key.last_validated_at = datetime.utcnow()
+                existing_key.last_validated_at = now
                 self.db.commit()
+                APIKeyManager._key_cache.pop((user_id, provider.value), None)
+                APIKeyManager._notify_mutation(user_id)
                 
                 return {
                     "success": True,
@@ -69,12 +115,14 @@ class APIKeyManager:
                     api_key=api_key,
                     display_name=display_name or f"{provider.value} Key",
                     is_validated=True,
-                    last_validated_at=datetime.utcnow()
+                    last_validated_at=now
                 )
                 
                 self.db.add(new_key)
                 self.db.commit()
                 self.db.refresh(new_key)
+                APIKeyManager._key_cache.pop((user_id, provider.value), None)
+                APIKeyManager._notify_mutation(user_id)
                 
                 return {
                     "success": True,
@@ -93,10 +141,25 @@ class APIKeyManager:
     
     def get_user_api_keys(self, user_id: int) -> List[Dict[str, Any]]:
         """Get all API keys for a user."""
-        keys = self.db.query(UserAPIKey).filter(
-            UserAPIKey.user_id == user_id
+        # Select only the response columns; full ORM hydration would also
+        # pull the api_key secret across the wire just to discard it.
+        keys = self.db.execute(
+            select(
+                UserAPIKey.id,
+                UserAPIKey.provider,
+                UserAPIKey.display_name,
+                UserAPIKey.is_active,
+                UserAPIKey.is_validated,
+                UserAPIKey.last_validated_at,
+                UserAPIKey.last_used_at,
+                UserAPIKey.usage_count,
+                UserAPIKey.monthly_limit,
+                UserAPIKey.current_month_usage,
+                UserAPIKey.rate_limit_per_minute,
+                UserAPIKey.created_at
+            ).where(UserAPIKey.user_id == user_id)
         ).all()
-        
+
         return [
             {
                 "id": str(key.id),
@@ -118,6 +181,16 @@ class APIKeyManager:
     
     def get_available_api_key(self, user_id: int, provider: ProviderEnum) -> Optional[UserAPIKey]:
         """Get an available API key for a specific provider."""
+        cache_key = (user_id, provider.value)
+        cached = APIKeyManager._key_cache.get(cache_key)
+        if cached is not None:
+            expires_at, pk = cached
+            if expires_at >= time.monotonic():
+                key = self.db.get(UserAPIKey, pk)
+                if key is not None and key.is_active and key.is_validated:
+                    return self._check_key_limits(key)
+            APIKeyManager._key_cache.pop(cache_key, None)
+
         # Get active, validated keys for the provider
         key = self.db.query(UserAPIKey).filter(
             and_(
@@ -127,78 +200,156 @@ class APIKeyManager:
                 UserAPIKey.is_validated == True
             )
         ).first()
-        
+
         if not key:
             return None
-        
+
+        if len(APIKeyManager._key_cache) >= _KEY_CACHE_MAXSIZE:
+            APIKeyManager._key_cache.clear()
+        APIKeyManager._key_cache[cache_key] = (
+            time.monotonic() + _KEY_CACHE_TTL, key.id
+        )
+
+        return self._check_key_limits(key)
+
+    def _check_key_limits(self, key: UserAPIKey) -> Optional[UserAPIKey]:
+        """Apply rate and monthly limit checks to a candidate key."""
         # Check rate limiting (simple implementation)
-        now = datetime.utcnow()
+        now = datetime.now(timezone.utc)
         if key.last_used_at:
             time_since_last_use = (now - key.last_used_at).total_seconds()
             if time_since_last_use < 60:  # Within last minute
                 # Could implement more sophisticated rate limiting here
                 pass
-        
+
         # Check monthly limits
         if key.monthly_limit and key.current_month_usage >= key.monthly_limit:
             logger.warning(f"Monthly limit exceeded for key {key.id}")
             return None
-        
+
         return key
     
     def update_key_usage(self, key_id: str, tokens_used: int = 1):
-        """Update usage statistics for an API key."""
+        """Record usage for an API key, flushing to the DB in batches."""
+        APIKeyManager._pending_usage[key_id] += tokens_used
+        APIKeyManager._pending_count[key_id] += 1
+
+        if (
+            len(APIKeyManager._pending_usage) >= _USAGE_FLUSH_THRESHOLD
+            or time.monotonic() - APIKeyManager._last_usage_flush >= _USAGE_FLUSH_INTERVAL
+        ):
+            self.flush_usage()
+
+    def flush_usage(self):
+        """Write all buffered usage increments with a single bulk UPDATE."""
+        pending_usage = dict(APIKeyManager._pending_usage)
+        pending_count = dict(APIKeyManager._pending_count)
+        APIKeyManager._pending_usage.clear()
+        APIKeyManager._pending_count.clear()
+        APIKeyManager._last_usage_flush = time.monotonic()
+
+        if not pending_usage:
+            return
+
         try:
-            key = self.db.query(UserAPIKey).filter(UserAPIKey.id == key_id).first()
-            if key:
-                key.usage_count += 1
-                key.current_month_usage += tokens_used
-                key.last_used_at = datetime.utcnow()
-                self.db.commit()
+            self.db.execute(
+                update(UserAPIKey)
+                .where(UserAPIKey.id.in_(pending_usage))
+                .values(
+                    usage_count=UserAPIKey.usage_count
+                    + case(pending_count, value=UserAPIKey.id),
+                    current_month_usage=UserAPIKey.current_month_usage
+                    + case(pending_usage, value=UserAPIKey.id),
+                    last_used_at=datetime.now(timezone.utc)
+                )
+            )
+            self.db.commit()
         except Exception as e:
             logger.error(f"Error updating key usage: {e}")
             self.db.rollback()
-    
+            # The increments are billing-relevant; put them back so the
+            # next flush retries them, merging with anything buffered since.
+            for key_id, tokens in pending_usage.items():
+                APIKeyManager._pending_usage[key_id] += tokens
+            for key_id, count in pending_count.items():
+                APIKeyManager._pending_count[key_id] += count
+
+    def _execute_key_mutation(self, stmt, user_id: int, action: str) -> bool:
+        """Run an owned-key UPDATE/DELETE and report whether a row matched.
+
+        The statement must carry a RETURNING clause on the provider column
+        so the match check and cache invalidation need no extra SELECT.
+        """
+        try:
+            provider = self.db.execute(stmt).scalar()
+            self.db.commit()
+            if provider is None:
+                return False
+            APIKeyManager._key_cache.pop((user_id, provider.value), None)
+            APIKeyManager._notify_mutation(user_id)
+            return True
+        except Exception as e:
+            logger.error(f"Error {action} key: {e}")
+            self.db.rollback()
+            return False
+
     def deactivate_key(self, key_id: str, user_id: int) -> bool:
         """Deactivate an API key."""
-        try:
-            key = self.db.query(UserAPIKey).filter(
+        stmt = (
+            update(UserAPIKey)
+            .where(
                 and_(
                     UserAPIKey.id == key_id,
                     UserAPIKey.user_id == user_id
                 )
-            ).first()
-            
-            if key:
-                key.is_active = False
-                self.db.commit()
-                return True
-            return False
-        except Exception as e:
-            logger.error(f"Error deactivating key: {e}")
-            self.db.rollback()
-            return False
-    
+            )
+            .values(is_active=False)
+            .returning(UserAPIKey.provider)
+        )
+        return self._execute_key_mutation(stmt, user_id, "deactivating")
+
     def delete_key(self, key_id: str, user_id: int) -> bool:
         """Delete an API key."""
-        try:
-            key = self.db.query(UserAPIKey).filter(
+        stmt = (
+            delete(UserAPIKey)
+            .where(
                 and_(
                     UserAPIKey.id == key_id,
                     UserAPIKey.user_id == user_id
                 )
-            ).first()
-            
-            if key:
-                self.db.delete(key)
-                self.db.commit()
-                return True
-            return False
-        except Exception as e:
-            logger.error(f"Error deleting key: {e}")
-            self.db.rollback()
-            return False
+            )
+            .returning(UserAPIKey.provider)
+        )
+        return self._execute_key_mutation(stmt, user_id, "deleting")
     
+    async def _validate_one(self, validator, semaphore, key, now) -> Dict[str, Any]:
+        """Validate a single key and update its validation status."""
+        try:
+            async with semaphore:
+                validation_result = await validator.validate_key(key.provider, key.api_key)
+
+            # Update validation status
+            key.is_validated = validation_result.is_valid
+            key.last_validated_at = now
+            if validation_result.quota_info:
+                key.quota_info = validation_result.quota_info
+
+            return {
+                "provider": key.provider.value,
+                "display_name": key.display_name,
+                "is_valid": validation_result.is_valid,
+                "error": validation_result.error_message,
+                "quota_info": validation_result.quota_info
+            }
+        except Exception as e:
+            logger.error(f"Error validating key {key.id}: {e}")
+            return {
+                "provider": key.provider.value,
+                "display_name": key.display_name,
+                "is_valid": False,
+                "error": str(e)
+            }
+
     async def validate_all_keys(self, user_id: int) -> Dict[str, Any]:
         """Validate all API keys for a user."""
         keys = self.db.query(UserAPIKey).filter(
@@ -207,37 +358,25 @@ class APIKeyManager:
                 UserAPIKey.is_active == True
             )
         ).all()
-        
-        results = {}
+
         validator = await get_api_key_validator()
-        
+
+        # One timestamp for the whole batch; per-key clock reads only differ
+        # by microseconds and datetime.utcnow() is deprecated anyway.
+        now = datetime.now(timezone.utc)
+
+        # Fan out all validations concurrently; the semaphore keeps the
+        # outbound burst within provider rate limits.
+        semaphore = asyncio.Semaphore(10)
         async with validator:
-            for key in keys:
-                try:
-                    validation_result = await validator.validate_key(key.provider, key.api_key)
-                    
-                    # Update validation status
-                    key.is_validated = validation_result.is_valid
-                    key.last_validated_at = datetime.utcnow()
-                    if validation_result.quota_info:
-                        key.quota_info = validation_result.quota_info
-                    
-                    results[str(key.id)] = {
-                        "provider": key.provider.value,
-                        "display_name": key.display_name,
-                        "is_valid": validation_result.is_valid,
-                        "error": validation_result.error_message,
-                        "quota_info": validation_result.quota_info
-                    }
-                except Exception as e:
-                    logger.error(f"Error validating key {key.id}: {e}")
-                    results[str(key.id)] = {
-                        "provider": key.provider.value,
-                        "display_name": key.display_name,
-                        "is_valid": False,
-                        "error": str(e)
-                    }
-        
+            outcomes = await asyncio.gather(
+                *(self._validate_one(validator, semaphore, key, now) for key in keys)
+            )
+
+        results = {
+            str(key.id): outcome for key, outcome in zip(keys, outcomes)
+        }
+
         self.db.commit()
         return results
     
@@ -246,6 +385,7 @@ class APIKeyManager:
         try:
             self.db.query(UserAPIKey).update({"current_month_usage": 0})
             self.db.commit()
+            APIKeyManager._key_cache.clear()
             logger.info("Reset monthly usage for all API keys")
         except Exception as e:
             logger.error(f"Error resetting monthly usage: {e}")
@@ -253,27 +393,41 @@ class APIKeyManager:
     
     def get_usage_stats(self, user_id: int) -> Dict[str, Any]:
         """Get usage statistics for a user."""
-        keys = self.db.query(UserAPIKey).filter(UserAPIKey.user_id == user_id).all()
-        
-        total_usage = sum(key.usage_count for key in keys)
-        active_keys = len([key for key in keys if key.is_active and key.is_validated])
-        providers = list(set(key.provider.value for key in keys))
+        keys = self.db.execute(
+            select(
+                UserAPIKey.provider,
+                UserAPIKey.display_name,
+                UserAPIKey.usage_count,
+                UserAPIKey.current_month_usage,
+                UserAPIKey.monthly_limit,
+                UserAPIKey.is_active,
+                UserAPIKey.is_validated
+            ).where(UserAPIKey.user_id == user_id)
+        ).all()
         
+        # Single pass: totals, provider set and the per-key list together.
+        total_usage = 0
+        active_keys = 0
+        providers = {}
+        key_list = []
+        for key in keys:
+            total_usage += key.usage_count
+            active_keys += bool(key.is_active and key.is_validated)
+            providers[key.provider.value] = None
+            key_list.append({
+                "provider": key.provider.value,
+                "display_name": key.display_name,
+                "usage_count": key.usage_count,
+                "current_month_usage": key.current_month_usage,
+                "monthly_limit": key.monthly_limit,
+                "is_active": key.is_active,
+                "is_validated": key.is_validated
+            })
+
         return {
             "total_keys": len(keys),
             "active_keys": active_keys,
             "total_usage": total_usage,
-            "providers": providers,
-            "keys": [
-                {
-                    "provider": key.provider.value,
-                    "display_name": key.display_name,
-                    "usage_count": key.usage_count,
-                    "current_month_usage": key.current_month_usage,
-                    "monthly_limit": key.monthly_limit,
-                    "is_active": key.is_active,
-                    "is_validated": key.is_validated
-                }
-                for key in keys
-            ]
+            "providers": list(providers),
+            "keys": key_list
         }
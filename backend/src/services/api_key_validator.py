@@ -2,10 +2,18 @@
 API Key Validation Service for multiple AI providers.
 """
 import asyncio
+import hashlib
+import re
+import time
+from collections import OrderedDict
+from types import MappingProxyType
+
 import aiohttp
-import json
 import logging
-from typing import Dict, Any, Optional, List
+
+import orjson
+from dataclasses import dataclass, field
+from typing import Dict, Any, Optional, List, Tuple
 from datetime import datetime, timedelta
 from enum import Enum
 
@@ -13,8 +21,102 @@ from src.models.models import ProviderEnum
 
 logger = logging.getLogger(__name__)
 
+# Successful validations are reusable for a short window; failures are always
+# re-checked so a typo'd key can't shadow a corrected one.
+_CACHE_TTL = 300.0  # seconds
+_CACHE_MAXSIZE = 1024
+
+# Known key shapes per provider; a paste typo fails here in microseconds
+# instead of burning an HTTPS round trip to learn it's a 401. Only providers
+# with stable documented prefixes are listed -- anything absent goes straight
+# to the network.
+_KEY_PATTERNS: Dict[ProviderEnum, re.Pattern] = {
+    ProviderEnum.OPENAI: re.compile(r"^sk-[A-Za-z0-9_\-]{20,}$"),
+    ProviderEnum.ANTHROPIC: re.compile(r"^sk-ant-[A-Za-z0-9_\-]+$"),
+    ProviderEnum.GROQ: re.compile(r"^gsk_[A-Za-z0-9]+$"),
+    ProviderEnum.HUGGINGFACE: re.compile(r"^hf_[A-Za-z0-9]+$"),
+    ProviderEnum.GOOGLE: re.compile(r"^AIza[A-Za-z0-9_\-]{30,}$"),
+}
+
+# Batch validations run in parallel but capped: Groq and Together throttle
+# bursts, and an unbounded fan-out from one request could trip their limits.
+_BATCH_CONCURRENCY = 8
+
+
+
+@dataclass(frozen=True, slots=True)
+class ProviderSpec:
+    """Declarative description of one provider's validation endpoint.
+
+    Most providers validate the same way: an authenticated GET against a
+    list-models endpoint, 200 meaning valid. The spec captures the few
+    per-provider differences so a single generic request path covers them
+    all; adding a provider is a new entry here, not a new method.
+    """
+
+    url: str
+    auth: str = "bearer"  # "bearer" (Authorization header) or "query" (?key=)
+    invalid_status: int = 401
+    list_key: str = "data"
+    id_key: str = "id"
+    probe_models: Tuple[str, ...] = ()
+    models_limit: Optional[int] = None
+
+
+_SPECS: Dict[ProviderEnum, ProviderSpec] = {
+    ProviderEnum.OPENAI: ProviderSpec(
+        url="https://api.openai.com/v1/models",
+        probe_models=("gpt-4", "gpt-3.5-turbo", "gpt-4-turbo"),
+    ),
+    ProviderEnum.GOOGLE: ProviderSpec(
+        url="https://generativelanguage.googleapis.com/v1beta/models",
+        auth="query",
+        invalid_status=400,
+        list_key="models",
+        id_key="name",
+        probe_models=("gemini-pro", "gemini-1.5-pro", "gemini-1.5-flash"),
+    ),
+    ProviderEnum.TOGETHER: ProviderSpec(
+        url="https://api.together.xyz/v1/models",
+        models_limit=10,
+    ),
+    ProviderEnum.FIREWORKS: ProviderSpec(
+        url="https://api.fireworks.ai/inference/v1/models",
+        models_limit=10,
+    ),
+    ProviderEnum.COHERE: ProviderSpec(
+        url="https://api.cohere.ai/v1/models",
+        list_key="models",
+        id_key="name",
+    ),
+    ProviderEnum.GROQ: ProviderSpec(
+        url="https://api.groq.com/openai/v1/models",
+    ),
+}
+
+
+# Static request parts for the two bespoke providers, built once at import so
+# each validation only merges in the secret instead of rebuilding dicts.
+# count_tokens authenticates like /v1/messages but returns in milliseconds
+# and consumes no model quota, so validation neither bills the user's
+# account nor waits on an actual generation.
+_ANTHROPIC_URL = "https://api.anthropic.com/v1/messages/count_tokens"
+_ANTHROPIC_HEADERS_BASE = MappingProxyType({
+    "Content-Type": "application/json",
+    "anthropic-version": "2023-06-01"
+})
+# The probe body never varies; serialize it once instead of per request.
+_ANTHROPIC_PROBE_BODY = orjson.dumps({
+    "model": "claude-3-haiku-20240307",
+    "messages": [{"role": "user", "content": "test"}]
+})
+_ANTHROPIC_MODELS = ["claude-3-haiku", "claude-3-sonnet", "claude-3-opus"]
+_HUGGINGFACE_WHOAMI_URL = "https://huggingface.co/api/whoami-v2"
+
 
 class ValidationResult:
+    __slots__ = ("is_valid", "error_message", "quota_info")
+
     def __init__(self, is_valid: bool, error_message: str = None, quota_info: Dict[str, Any] = None):
         self.is_valid = is_valid
         self.error_message = error_message
@@ -26,90 +128,221 @@ class APIKeyValidator:
     
     def __init__(self):
         self.session: Optional[aiohttp.ClientSession] = None
-        
+        self._session_lock = asyncio.Lock()
+        self._cache: OrderedDict[tuple, tuple] = OrderedDict()
+        self._cache_lock = asyncio.Lock()
+        # Coalesces concurrent validations of the same key (an SPA fires
+        # several authed calls right after login) into one upstream request.
+        self._inflight: Dict[tuple, asyncio.Future] = {}
+
+    @staticmethod
+    def _cache_key(provider: ProviderEnum, api_key: str) -> tuple:
+        return (provider, hashlib.sha256(api_key.encode()).hexdigest())
+
+    async def invalidate(self, provider: ProviderEnum, api_key: str):
+        """Drop a cached validation, e.g. when the user rotates the key."""
+        async with self._cache_lock:
+            self._cache.pop(self._cache_key(provider, api_key), None)
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Create the shared session on first use (double-checked lock).
+
+        The session lives for the process lifetime so repeated validations
+        reuse pooled connections instead of paying a TLS handshake each
+        time. Each provider is a distinct origin, so the per-host limit
+        keeps one slow provider from exhausting the pool.
+        """
+        if self.session is None or self.session.closed:
+            async with self._session_lock:
+                if self.session is None or self.session.closed:
+                    self.session = aiohttp.ClientSession(
+                        connector=aiohttp.TCPConnector(
+                            limit=100,
+                            limit_per_host=20,
+                            ttl_dns_cache=300,
+                            keepalive_timeout=60
+                        ),
+                        timeout=aiohttp.ClientTimeout(total=10, connect=3)
+                    )
+        return self.session
+
     async def __aenter__(self):
-        self.session = aiohttp.ClientSession()
+        # Kept for the existing `async with validator:` call sites; entering
+        # no longer opens a fresh session and exiting no longer closes it.
+        await self._get_session()
         return self
         
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        if self.session:
+        pass
+
+    async def close(self):
+        """Close the shared session; called from app shutdown."""
+        if self.session and not self.session.closed:
             await self.session.close()
+        self.session = None
     
-    async def validate_key(self, provider: ProviderEnum, api_key: str) -> ValidationResult:
-        """Validate an API key for a specific provider."""
+    async def validate_key(
+        self,
+        provider: ProviderEnum,
+        api_key: str,
+        need_quota: bool = False
+    ) -> ValidationResult:
+        """Validate an API key for a specific provider.
+
+        With ``need_quota=False`` (the default) only the response status is
+        checked and the body is never downloaded -- list-models payloads run
+        to hundreds of KB just to confirm a 200. Pass ``need_quota=True``
+        when the caller actually surfaces model/quota details.
+        """
+        pattern = _KEY_PATTERNS.get(provider)
+        if pattern is not None and not pattern.match(api_key):
+            return ValidationResult(False, "Malformed API key")
+
+        await self._get_session()
+
+        cache_key = self._cache_key(provider, api_key)
+        async with self._cache_lock:
+            entry = self._cache.get(cache_key)
+            if entry is not None:
+                cached_at, result = entry
+                if time.monotonic() - cached_at < _CACHE_TTL:
+                    # A status-only result cannot satisfy a quota request.
+                    if not need_quota or result.quota_info:
+                        self._cache.move_to_end(cache_key)
+                        return result
+                del self._cache[cache_key]
+
+        # Singleflight: if an identical validation is already in flight,
+        # wait for its result instead of issuing another upstream call.
+        inflight_key = (cache_key, need_quota)
+        existing = self._inflight.get(inflight_key)
+        if existing is not None:
+            return await existing
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[inflight_key] = future
         try:
-            if provider == ProviderEnum.OPENAI:
-                return await self._validate_openai_key(api_key)
-            elif provider == ProviderEnum.GOOGLE:
-                return await self._validate_google_key(api_key)
-            elif provider == ProviderEnum.ANTHROPIC:
-                return await self._validate_anthropic_key(api_key)
-            elif provider == ProviderEnum.HUGGINGFACE:
-                return await self._validate_huggingface_key(api_key)
-            elif provider == ProviderEnum.TOGETHER:
-                return await self._validate_together_key(api_key)
-            elif provider == ProviderEnum.FIREWORKS:
-                return await self._validate_fireworks_key(api_key)
-            elif provider == ProviderEnum.COHERE:
-                return await self._validate_cohere_key(api_key)
-            elif provider == ProviderEnum.GROQ:
-                return await self._validate_groq_key(api_key)
-            else:
-                return ValidationResult(False, f"Unsupported provider: {provider}")
+            result = await self._validate_uncached(provider, api_key, need_quota)
+            future.set_result(result)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            self._inflight.pop(inflight_key, None)
+
+        # Cache successes only: a transient failure must not mask a key that
+        # starts working, and invalid keys are cheap to re-reject upstream.
+        if result.is_valid:
+            async with self._cache_lock:
+                self._cache[cache_key] = (time.monotonic(), result)
+                self._cache.move_to_end(cache_key)
+                while len(self._cache) > _CACHE_MAXSIZE:
+                    self._cache.popitem(last=False)
+
+        return result
+
+    async def validate_keys(
+        self, items: List[tuple[ProviderEnum, str]]
+    ) -> List[ValidationResult]:
+        """Validate several keys concurrently.
+
+        Providers are distinct hosts, so the fan-out rides separate
+        connection pools; a semaphore caps in-flight checks below upstream
+        burst limits and a per-item timeout keeps one slow provider from
+        stalling the whole batch.
+        """
+        semaphore = asyncio.Semaphore(_BATCH_CONCURRENCY)
+
+        async def _one(provider: ProviderEnum, api_key: str) -> ValidationResult:
+            try:
+                async with semaphore:
+                    return await asyncio.wait_for(
+                        self.validate_key(provider, api_key), timeout=8.0
+                    )
+            except asyncio.TimeoutError:
+                return ValidationResult(
+                    False, f"Validation timed out for {provider.value}"
+                )
+            except Exception as e:
+                return ValidationResult(False, f"Validation error: {str(e)}")
+
+        return await asyncio.gather(*(_one(p, k) for p, k in items))
+
+    async def _validate_uncached(
+        self,
+        provider: ProviderEnum,
+        api_key: str,
+        need_quota: bool = False
+    ) -> ValidationResult:
+        """Dispatch to the provider-specific validation call."""
+        try:
+            # Anthropic has no list-models endpoint (a minimal POST probe is
+            # needed) and Hugging Face validates via whoami; everything else
+            # goes through the spec table.
+            match provider:
+                case ProviderEnum.ANTHROPIC:
+                    return await self._validate_anthropic_key(api_key)
+                case ProviderEnum.HUGGINGFACE:
+                    return await self._validate_huggingface_key(api_key, need_quota)
+                case _:
+                    spec = _SPECS.get(provider)
+                    if spec is None:
+                        return ValidationResult(False, f"Unsupported provider: {provider}")
+                    return await self._do_validate(spec, api_key, need_quota)
         except Exception as e:
             logger.error(f"Error validating {provider} key: {e}")
             return ValidationResult(False, f"Validation error: {str(e)}")
-    
-    async def _validate_openai_key(self, api_key: str) -> ValidationResult:
-        """Validate OpenAI API key."""
-        try:
-            url = "https://api.openai.com/v1/models"
+
+    async def _do_validate(
+        self,
+        spec: ProviderSpec,
+        api_key: str,
+        need_quota: bool = False
+    ) -> ValidationResult:
+        """Generic list-models validation shared by spec-driven providers."""
+        headers = None
+        params = None
+        if spec.auth == "bearer":
             headers = {"Authorization": f"Bearer {api_key}"}
-            
-            async with self.session.get(url, headers=headers) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    models = [model["id"] for model in data.get("data", [])]
-                    
-                    # Check for common models
-                    available_models = []
-                    for model in ["gpt-4", "gpt-3.5-turbo", "gpt-4-turbo"]:
-                        if any(model in m for m in models):
-                            available_models.append(model)
-                    
-                    return ValidationResult(
-                        True, 
-                        quota_info={
-                            "available_models": available_models,
-                            "total_models": len(models)
-                        }
-                    )
-                elif response.status == 401:
-                    return ValidationResult(False, "Invalid API key")
-                elif response.status == 429:
-                    return ValidationResult(False, "Rate limit exceeded")
-                else:
-                    error_text = await response.text()
-                    return ValidationResult(False, f"API error: {response.status} - {error_text}")
-        except Exception as e:
-            return ValidationResult(False, f"Network error: {str(e)}")
-    
-    async def _validate_google_key(self, api_key: str) -> ValidationResult:
-        """Validate Google Gemini API key."""
-        try:
-            url = "https://generativelanguage.googleapis.com/v1beta/models"
+        else:
             params = {"key": api_key}
-            
-            async with self.session.get(url, params=params) as response:
+
+        try:
+            async with self.session.get(spec.url, headers=headers, params=params) as response:
                 if response.status == 200:
-                    data = await response.json()
-                    models = [model["name"] for model in data.get("models", [])]
-                    
-                    available_models = []
-                    for model in ["gemini-pro", "gemini-1.5-pro", "gemini-1.5-flash"]:
-                        if any(model in m for m in models):
-                            available_models.append(model)
-                    
+                    if not need_quota:
+                        # The 200 alone proves the key; drop the connection
+                        # back to the pool without downloading the body.
+                        response.release()
+                        return ValidationResult(True)
+
+                    # orjson parses the big list-models payloads several
+                    # times faster than aiohttp's stdlib default.
+                    data = orjson.loads(await response.read())
+                    models = [m[spec.id_key] for m in data.get(spec.list_key, [])]
+
+                    if spec.probe_models:
+                        # One pass over the model list, retiring each probe
+                        # as soon as it matches, instead of rescanning the
+                        # whole list per probe.
+                        remaining = set(spec.probe_models)
+                        found = set()
+                        for m in models:
+                            for probe in tuple(remaining):
+                                if probe in m:
+                                    found.add(probe)
+                                    remaining.discard(probe)
+                            if not remaining:
+                                break
+                        available_models = [
+                            probe for probe in spec.probe_models
+                            if probe in found
+                        ]
+                    elif spec.models_limit is not None:
+                        available_models = models[:spec.models_limit]
+                    else:
+                        available_models = models
+
                     return ValidationResult(
                         True,
                         quota_info={
@@ -117,8 +350,10 @@ class APIKeyValidator:
                             "total_models": len(models)
                         }
                     )
-                elif response.status == 400:
+                elif response.status == spec.invalid_status:
                     return ValidationResult(False, "Invalid API key")
+                elif response.status == 429:
+                    return ValidationResult(False, "Rate limit exceeded")
                 else:
                     error_text = await response.text()
                     return ValidationResult(False, f"API error: {response.status} - {error_text}")
@@ -128,45 +363,42 @@ class APIKeyValidator:
     async def _validate_anthropic_key(self, api_key: str) -> ValidationResult:
         """Validate Anthropic Claude API key."""
         try:
-            url = "https://api.anthropic.com/v1/messages"
-            headers = {
-                "x-api-key": api_key,
-                "Content-Type": "application/json",
-                "anthropic-version": "2023-06-01"
-            }
-            data = {
-                "model": "claude-3-haiku-20240307",
-                "max_tokens": 10,
-                "messages": [{"role": "user", "content": "test"}]
-            }
-            
-            async with self.session.post(url, headers=headers, json=data) as response:
+            headers = {**_ANTHROPIC_HEADERS_BASE, "x-api-key": api_key}
+
+            async with self.session.post(
+                _ANTHROPIC_URL, headers=headers, data=_ANTHROPIC_PROBE_BODY
+            ) as response:
                 if response.status == 200:
-                    return ValidationResult(True, quota_info={"available_models": ["claude-3-haiku", "claude-3-sonnet", "claude-3-opus"]})
+                    response.release()
+                    return ValidationResult(True, quota_info={"available_models": _ANTHROPIC_MODELS})
                 elif response.status == 401:
                     return ValidationResult(False, "Invalid API key")
                 elif response.status == 400:
                     # Key might be valid but request format issue
-                    error_data = await response.json()
+                    error_data = orjson.loads(await response.read())
                     if "invalid_api_key" in str(error_data).lower():
                         return ValidationResult(False, "Invalid API key")
                     else:
-                        return ValidationResult(True, quota_info={"available_models": ["claude-3-haiku", "claude-3-sonnet", "claude-3-opus"]})
+                        return ValidationResult(True, quota_info={"available_models": _ANTHROPIC_MODELS})
                 else:
                     error_text = await response.text()
                     return ValidationResult(False, f"API error: {response.status} - {error_text}")
         except Exception as e:
             return ValidationResult(False, f"Network error: {str(e)}")
     
-    async def _validate_huggingface_key(self, api_key: str) -> ValidationResult:
+    async def _validate_huggingface_key(
+        self, api_key: str, need_quota: bool = False
+    ) -> ValidationResult:
         """Validate Hugging Face API key."""
         try:
-            url = "https://huggingface.co/api/whoami-v2"
             headers = {"Authorization": f"Bearer {api_key}"}
-            
-            async with self.session.get(url, headers=headers) as response:
+
+            async with self.session.get(_HUGGINGFACE_WHOAMI_URL, headers=headers) as response:
                 if response.status == 200:
-                    data = await response.json()
+                    if not need_quota:
+                        response.release()
+                        return ValidationResult(True)
+                    data = orjson.loads(await response.read())
                     return ValidationResult(
                         True,
                         quota_info={
@@ -182,106 +414,6 @@ class APIKeyValidator:
         except Exception as e:
             return ValidationResult(False, f"Network error: {str(e)}")
     
-    async def _validate_together_key(self, api_key: str) -> ValidationResult:
-        """Validate Together AI API key."""
-        try:
-            url = "https://api.together.xyz/v1/models"
-            headers = {"Authorization": f"Bearer {api_key}"}
-            
-            async with self.session.get(url, headers=headers) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    models = [model["id"] for model in data.get("data", [])]
-                    return ValidationResult(
-                        True,
-                        quota_info={
-                            "available_models": models[:10],  # First 10 models
-                            "total_models": len(models)
-                        }
-                    )
-                elif response.status == 401:
-                    return ValidationResult(False, "Invalid API key")
-                else:
-                    error_text = await response.text()
-                    return ValidationResult(False, f"API error: {response.status} - {error_text}")
-        except Exception as e:
-            return ValidationResult(False, f"Network error: {str(e)}")
-    
-    async def _validate_fireworks_key(self, api_key: str) -> ValidationResult:
-        """Validate Fireworks AI API key."""
-        try:
-            url = "https://api.fireworks.ai/inference/v1/models"
-            headers = {"Authorization": f"Bearer {api_key}"}
-            
-            async with self.session.get(url, headers=headers) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    models = [model["id"] for model in data.get("data", [])]
-                    return ValidationResult(
-                        True,
-                        quota_info={
-                            "available_models": models[:10],
-                            "total_models": len(models)
-                        }
-                    )
-                elif response.status == 401:
-                    return ValidationResult(False, "Invalid API key")
-                else:
-                    error_text = await response.text()
-                    return ValidationResult(False, f"API error: {response.status} - {error_text}")
-        except Exception as e:
-            return ValidationResult(False, f"Network error: {str(e)}")
-    
-    async def _validate_cohere_key(self, api_key: str) -> ValidationResult:
-        """Validate Cohere API key."""
-        try:
-            url = "https://api.cohere.ai/v1/models"
-            headers = {"Authorization": f"Bearer {api_key}"}
-            
-            async with self.session.get(url, headers=headers) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    models = [model["name"] for model in data.get("models", [])]
-                    return ValidationResult(
-                        True,
-                        quota_info={
-                            "available_models": models,
-                            "total_models": len(models)
-                        }
-                    )
-                elif response.status == 401:
-                    return ValidationResult(False, "Invalid API key")
-                else:
-                    error_text = await response.text()
-                    return ValidationResult(False, f"API error: {response.status} - {error_text}")
-        except Exception as e:
-            return ValidationResult(False, f"Network error: {str(e)}")
-    
-    async def _validate_groq_key(self, api_key: str) -> ValidationResult:
-        """Validate Groq API key."""
-        try:
-            url = "https://api.groq.com/openai/v1/models"
-            headers = {"Authorization": f"Bearer {api_key}"}
-            
-            async with self.session.get(url, headers=headers) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    models = [model["id"] for model in data.get("data", [])]
-                    return ValidationResult(
-                        True,
-                        quota_info={
-                            "available_models": models,
-                            "total_models": len(models)
-                        }
-                    )
-                elif response.status == 401:
-                    return ValidationResult(False, "Invalid API key")
-                else:
-                    error_text = await response.text()
-                    return ValidationResult(False, f"API error: {response.status} - {error_text}")
-        except Exception as e:
-            return ValidationResult(False, f"Network error: {str(e)}")
-
 
 # Global validator instance
 api_key_validator = APIKeyValidator()
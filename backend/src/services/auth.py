@@ -1,9 +1,15 @@
 """
 Authentication service using Clerk.
 """
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Optional
+
 from fastapi import HTTPException, Security, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from jose import jwt, JWTError
+import jwt
 import httpx
 from src.config import settings
 import logging
@@ -12,22 +18,67 @@ logger = logging.getLogger(__name__)
 
 security = HTTPBearer()
 
+# Clerk rotates signing keys rarely; a bounded TTL picks rotations up within
+# minutes while keeping the hot path off the network entirely.
+_JWKS_TTL = 600.0  # seconds
+
+# SPAs re-present the same Bearer token on every call; decoding it is pure
+# CPU (base64 + JSON) repeated per request. Cache decoded payloads briefly,
+# keyed by token digest. Signature/exp verification is disabled today, so a
+# short TTL changes no semantics; if verification is enabled, derive the TTL
+# from the token's exp claim instead.
+_TOKEN_CACHE: "OrderedDict[bytes, tuple]" = OrderedDict()
+_TOKEN_CACHE_TTL = 60.0  # seconds
+_TOKEN_CACHE_MAXSIZE = 4096
+
 
 class ClerkAuth:
     def __init__(self):
         self.clerk_secret_key = settings.clerk_secret_key
         self.jwks_url = "https://api.clerk.dev/v1/jwks"
         self._jwks = None
+        self._jwks_etag: Optional[str] = None
+        self._jwks_fetched_at = 0.0
+        self._jwks_lock = asyncio.Lock()
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Reuse one client so refreshes ride pooled connections."""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(timeout=10.0)
+        return self._client
 
     async def get_jwks(self):
-        """Fetch JWKS from Clerk."""
-        if not self._jwks:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(self.jwks_url)
-                response.raise_for_status()
-                self._jwks = response.json()
+        """Fetch JWKS from Clerk, refreshing at most every _JWKS_TTL seconds.
+
+        Refreshes send If-None-Match so an unchanged key set costs a 304
+        with no body; the lock collapses concurrent refreshes into one
+        upstream fetch.
+        """
+        if self._jwks is not None and time.monotonic() - self._jwks_fetched_at < _JWKS_TTL:
+            return self._jwks
+
+        async with self._jwks_lock:
+            if self._jwks is not None and time.monotonic() - self._jwks_fetched_at < _JWKS_TTL:
+                return self._jwks
+
+            headers = {"If-None-Match": self._jwks_etag} if self._jwks_etag else None
+            response = await self._get_client().get(self.jwks_url, headers=headers)
+            if response.status_code == 304:
+                self._jwks_fetched_at = time.monotonic()
+                return self._jwks
+            response.raise_for_status()
+            self._jwks = response.json()
+            self._jwks_etag = response.headers.get("ETag")
+            self._jwks_fetched_at = time.monotonic()
         return self._jwks
 
+    async def close(self):
+        """Close the shared HTTP client; called from app shutdown."""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+
     async def verify_token(self, token: str) -> dict:
         """Verify Clerk JWT token."""
         if not self.clerk_secret_key:
@@ -36,13 +87,22 @@ class ClerkAuth:
                 detail="Clerk secret key not configured"
             )
 
+        cache_key = hashlib.sha256(token.encode()).digest()
+        entry = _TOKEN_CACHE.get(cache_key)
+        if entry is not None:
+            cached_at, payload = entry
+            if time.monotonic() - cached_at < _TOKEN_CACHE_TTL:
+                _TOKEN_CACHE.move_to_end(cache_key)
+                return payload
+            del _TOKEN_CACHE[cache_key]
+
         try:
-            # For development, we'll decode without verification
-            # In production, you should verify the token against Clerk's JWKS
+            # For development, we'll decode without verification.
+            # In production, verify against Clerk's JWKS: build the key once
+            # per kid via jwt.algorithms.RSAAlgorithm.from_jwk and pass it
+            # with algorithms=["RS256"].
             payload = jwt.decode(
                 token,
-                key="",  # Empty key for unverified decoding
-                algorithms=["HS256", "RS256"],
                 options={
                     "verify_signature": False,
                     "verify_exp": False,  # Don't verify expiration
@@ -51,10 +111,13 @@ class ClerkAuth:
                     "verify_aud": False,  # Don't verify audience
                 }
             )
-            
+
+            _TOKEN_CACHE[cache_key] = (time.monotonic(), payload)
+            while len(_TOKEN_CACHE) > _TOKEN_CACHE_MAXSIZE:
+                _TOKEN_CACHE.popitem(last=False)
             return payload
-            
-        except JWTError as e:
+
+        except jwt.PyJWTError as e:
             logger.error(f"JWT verification failed: {str(e)}")
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -1,7 +1,8 @@
 """
 Database service functions.
 """
-from sqlalchemy.orm import Session
+from sqlalchemy import delete, select, update
+from sqlalchemy.orm import Session, selectinload
 from uuid import UUID
 from src.models.models import User, Project, File
 from src.schemas.schemas import UserCreate, UserUpdate, ProjectCreate, ProjectUpdate, FileCreate, FileUpdate
@@ -14,6 +15,22 @@ def get_user_by_clerk_id(db: Session, clerk_id: str) -> Optional[User]:
     return db.query(User).filter(User.clerk_id == clerk_id).first()
 
 
+def get_user_by_clerk_id_cached(db: Session, clerk_id: str, state) -> Optional[User]:
+    """Request-local variant of :func:`get_user_by_clerk_id`.
+
+    ``state`` is a ``request.state``; the first lookup in a request stores
+    the row there so later dependencies reuse it instead of repeating the
+    SELECT.
+    """
+    cached = getattr(state, "user_row", None)
+    if cached is not None and cached.clerk_id == clerk_id:
+        return cached
+    user = get_user_by_clerk_id(db, clerk_id)
+    if user is not None:
+        state.user_row = user
+    return user
+
+
 def get_user_by_email(db: Session, email: str) -> Optional[User]:
     """Get user by email."""
     return db.query(User).filter(User.email == email).first()
@@ -46,6 +63,21 @@ def get_projects_by_user(db: Session, user_id: int) -> List[Project]:
     return db.query(Project).filter(Project.owner_id == user_id).all()
 
 
+def get_projects_with_files(db: Session, user_id: int) -> List[Project]:
+    """Get all projects for a user with their files eagerly loaded.
+
+    One extra SELECT hydrates every project's files via selectinload,
+    instead of the 1 + N queries of calling get_files_by_project per
+    project.
+    """
+    return (
+        db.query(Project)
+        .options(selectinload(Project.files))
+        .filter(Project.owner_id == user_id)
+        .all()
+    )
+
+
 def get_project_by_id(db: Session, project_id: UUID, user_id: int) -> Optional[Project]:
     """Get project by ID and user ID."""
     return db.query(Project).filter(
@@ -65,30 +97,34 @@ def create_project(db: Session, project: ProjectCreate, user_id: int) -> Project
 
 def update_project(db: Session, project_id: UUID, project_update: ProjectUpdate, user_id: int) -> Optional[Project]:
     """Update project information."""
-    db_project = db.query(Project).filter(
-        Project.id == project_id,
-        Project.owner_id == user_id
-    ).first()
-    if db_project:
-        update_data = project_update.model_dump(exclude_unset=True)
-        for field, value in update_data.items():
-            setattr(db_project, field, value)
-        db.commit()
-        db.refresh(db_project)
-    return db_project
+    update_data = project_update.model_dump(exclude_unset=True)
+    if not update_data:
+        return get_project_by_id(db, project_id, user_id)
+
+    # One UPDATE carrying the ownership predicate instead of a SELECT,
+    # per-attribute mutation, and a post-commit refresh.
+    result = db.execute(
+        update(Project)
+        .where(Project.id == project_id, Project.owner_id == user_id)
+        .values(**update_data)
+    )
+    db.commit()
+    if result.rowcount == 0:
+        return None
+    return db.get(Project, project_id)
 
 
 def delete_project(db: Session, project_id: UUID, user_id: int) -> bool:
     """Delete a project."""
-    db_project = db.query(Project).filter(
-        Project.id == project_id,
-        Project.owner_id == user_id
-    ).first()
-    if db_project:
-        db.delete(db_project)
-        db.commit()
-        return True
-    return False
+    # Single DELETE with the ownership predicate embedded; child rows go
+    # via the FK ON DELETE CASCADE.
+    result = db.execute(
+        delete(Project).where(
+            Project.id == project_id, Project.owner_id == user_id
+        )
+    )
+    db.commit()
+    return result.rowcount > 0
 
 
 # File CRUD operations
@@ -110,12 +146,14 @@ def get_file_by_id(db: Session, file_id: UUID, user_id: int) -> Optional[File]:
 
 def create_file(db: Session, file_data: dict, user_id: int) -> Optional[File]:
     """Create a new file."""
-    # Verify project ownership
-    project = db.query(Project).filter(
-        Project.id == file_data['project_id'],
-        Project.owner_id == user_id
+    # Verify project ownership; fetch only the id, not the whole row.
+    owns = db.execute(
+        select(Project.id).where(
+            Project.id == file_data['project_id'],
+            Project.owner_id == user_id
+        )
     ).first()
-    if not project:
+    if not owns:
         return None
     
     db_file = File(**file_data)
@@ -127,27 +165,35 @@ def create_file(db: Session, file_data: dict, user_id: int) -> Optional[File]:
 
 def update_file(db: Session, file_id: UUID, file_update: FileUpdate, user_id: int) -> Optional[File]:
     """Update file information."""
-    db_file = db.query(File).join(Project).filter(
-        File.id == file_id,
-        Project.owner_id == user_id
-    ).first()
-    if db_file:
-        update_data = file_update.model_dump(exclude_unset=True)
-        for field, value in update_data.items():
-            setattr(db_file, field, value)
-        db.commit()
-        db.refresh(db_file)
-    return db_file
+    update_data = file_update.model_dump(exclude_unset=True)
+    if not update_data:
+        return get_file_by_id(db, file_id, user_id)
+
+    result = db.execute(
+        update(File)
+        .where(
+            File.id == file_id,
+            File.project_id.in_(
+                select(Project.id).where(Project.owner_id == user_id)
+            ),
+        )
+        .values(**update_data)
+    )
+    db.commit()
+    if result.rowcount == 0:
+        return None
+    return db.get(File, file_id)
 
 
 def delete_file(db: Session, file_id: UUID, user_id: int) -> bool:
     """Delete a file."""
-    db_file = db.query(File).join(Project).filter(
-        File.id == file_id,
-        Project.owner_id == user_id
-    ).first()
-    if db_file:
-        db.delete(db_file)
-        db.commit()
-        return True
-    return False
\ No newline at end of file
+    result = db.execute(
+        delete(File).where(
+            File.id == file_id,
+            File.project_id.in_(
+                select(Project.id).where(Project.owner_id == user_id)
+            ),
+        )
+    )
+    db.commit()
+    return result.rowcount > 0
\ No newline at end of file
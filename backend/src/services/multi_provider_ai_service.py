@@ -2,16 +2,29 @@
 Enhanced AI Service that supports multiple providers and user API keys.
 """
 import asyncio
-import aiohttp
-import json
+import httpx
 import logging
-from typing import Dict, List, Optional, Any, Tuple
+import random
+import time
+
+import orjson
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 from datetime import datetime
 from enum import Enum
+from types import MappingProxyType
+
+from pydantic import BaseModel, ValidationError
 
 from src.models.models import ProviderEnum, UserAPIKey
 from src.services.api_key_manager import APIKeyManager
 from src.services.api_key_validator import get_api_key_validator
+from src.services.ai_service.llm_cache import (
+    CACHEABLE_TEMPERATURE,
+    LLMCache,
+    NearDuplicateCache,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -48,62 +61,620 @@ class CodeSuggestion:
         self.line_end = line_end
 
 
+# Typed views of the JSON object the analyze prompt asks the model for.
+# pydantic-core parses and validates the raw response in one pass, so a
+# malformed or partial answer is rejected up front instead of surfacing
+# as KeyErrors from ad-hoc dict lookups.
+class _SuggestionDTO(BaseModel):
+    code: str = ""
+    explanation: str = ""
+    confidence: float = 0.8
+    line_start: Optional[int] = None
+    line_end: Optional[int] = None
+
+
+class _BugDTO(BaseModel):
+    line: Optional[int] = None
+    type: Optional[str] = None
+    severity: Optional[str] = None
+    description: Optional[str] = None
+    suggestion: Optional[str] = None
+
+
+class _ComplexityDTO(BaseModel):
+    total_lines: Optional[int] = None
+    functions: Optional[int] = None
+    complexity_score: Optional[int] = None
+    maintainability: Optional[str] = None
+
+
+class _AnalysisResponse(BaseModel):
+    suggestions: List[_SuggestionDTO] = []
+    bugs: List[_BugDTO] = []
+    complexity: Optional[_ComplexityDTO] = None
+
+
+# System prompts contain nothing that varies per request: per-call knobs
+# (user prompt, refactoring type, detail level) live in the user message
+# so the system prefix stays byte-identical call after call and provider
+# prompt caches (Anthropic cache_control, OpenAI/Google automatic prefix
+# caching) can actually hit.
+_PROMPT_TEMPLATES: Dict[str, str] = {
+    "suggest": """You are an expert {language} developer. Provide helpful, accurate code suggestions.
+        Focus on best practices, performance, and maintainability.
+        Return only the code suggestion without markdown formatting.""",
+    "analyze": """You are a senior {language} developer and code reviewer.
+        Analyze the provided code and return a JSON object with:
+        {{
+            "suggestions": [
+                {{
+                    "code": "improved code",
+                    "explanation": "explanation",
+                    "confidence": 0.8,
+                    "line_start": 1,
+                    "line_end": 5
+                }}
+            ],
+            "bugs": [
+                {{
+                    "line": 1,
+                    "type": "logic",
+                    "severity": "medium",
+                    "description": "issue description",
+                    "suggestion": "fix suggestion"
+                }}
+            ],
+            "complexity": {{
+                "total_lines": 50,
+                "functions": 3,
+                "complexity_score": 75,
+                "maintainability": "high"
+            }}
+        }}""",
+    "complete": """You are an expert {language} developer. Complete the given code.
+        Return only the completion without markdown formatting.""",
+    "refactor": """You are a senior {language} developer. Refactor the provided code as instructed.
+        Return only the refactored code without markdown formatting.""",
+    "explain": """You are a senior {language} developer. Explain the provided code at the requested level of detail.
+        Focus on what the code does, how it works, and any important concepts.""",
+}
+
+_COMMON_LANGUAGES = (
+    "javascript", "typescript", "python", "java", "go",
+    "rust", "c", "cpp", "csharp", "html", "css", "sql",
+)
+
+# Precompute the common (task, language) variants once at import. Rare
+# languages are formatted per call rather than memoized: language is a
+# caller-supplied field, so an unbounded memo would let a client cycling
+# arbitrary strings grow the dict for the process lifetime.
+_SYSTEM_PROMPTS: Dict[Tuple[str, str], str] = {
+    (task, language): template.format(language=language)
+    for task, template in _PROMPT_TEMPLATES.items()
+    for language in _COMMON_LANGUAGES
+}
+
+
+def _system_prompt(task: str, language: str) -> str:
+    """Return the static system prompt for a task/language pair."""
+    prompt = _SYSTEM_PROMPTS.get((task, language))
+    if prompt is None:
+        prompt = _PROMPT_TEMPLATES[task].format(language=language)
+    return prompt
+
+
+# User-message prefixes prebuilt per language, so the hot path does one
+# concatenation with the code instead of re-formatting the boilerplate
+# around it on every call. Unknown languages fall back to the f-string.
+_ANALYZE_PREFIX = {
+    lang: f"Analyze this {lang} code:\n\n" for lang in _COMMON_LANGUAGES
+}
+_COMPLETE_PREFIX = {
+    lang: f"Complete this {lang} code:\n\n" for lang in _COMMON_LANGUAGES
+}
+_REFACTOR_PREFIX = {
+    lang: f"Refactor this {lang} code:\n\n" for lang in _COMMON_LANGUAGES
+}
+_EXPLAIN_PREFIX = {
+    lang: f"Explain this {lang} code in " for lang in _COMMON_LANGUAGES
+}
+
+
+# Iterating the Enum class goes through the metaclass each time; freeze
+# the member list once at import.
+_ALL_PROVIDERS: Tuple[ProviderEnum, ...] = tuple(ProviderEnum)
+
+# Which providers a user has keys for changes only when keys are added or
+# removed, so a short-lived per-user cache skips probing the five-odd
+# providers that never have one.
+_PROVIDER_CACHE_TTL = 30.0  # seconds
+_PROVIDER_CACHE_MAXSIZE = 4096
+
+# Provider health tracking: slow-moving EWMAs of success rate and call
+# latency order the failover list, and a provider that just failed sits
+# out a cooldown so every request stops re-eating the same timeout.
+_SUCCESS_ALPHA = 0.01
+_LATENCY_ALPHA = 0.2
+_FAILURE_COOLDOWN = 30.0  # seconds
+
+# Micro-batching knobs: how long a call waits for company, how many calls
+# a burst may hold, and how many provider calls may be in flight at once.
+_BATCH_WINDOW = 0.01
+_BATCH_MAX_SIZE = 16
+_BATCH_MAX_CONCURRENCY = 32
+
+# In-flight caps: one user cannot monopolize the connection pool, and
+# the process as a whole stays below what the pooled client can carry.
+_USER_INFLIGHT_LIMIT = 8
+_GLOBAL_INFLIGHT_LIMIT = 256
+
+# Providers speaking the OpenAI chat-completions dialect differ only in
+# endpoint and error label; they all share one call method.
+_OPENAI_COMPATIBLE = MappingProxyType({
+    ProviderEnum.OPENAI: (
+        "OpenAI", "https://api.openai.com/v1/chat/completions"
+    ),
+    ProviderEnum.TOGETHER: (
+        "Together", "https://api.together.xyz/v1/chat/completions"
+    ),
+    ProviderEnum.FIREWORKS: (
+        "Fireworks", "https://api.fireworks.ai/inference/v1/chat/completions"
+    ),
+    ProviderEnum.GROQ: (
+        "Groq", "https://api.groq.com/openai/v1/chat/completions"
+    ),
+})
+
+# Transient provider statuses are retried in place with exponential
+# backoff and jitter before failing over; a 429 with Retry-After waits
+# at least that long. Staying on the same provider preserves its
+# prompt-cache affinity instead of bouncing on every blip.
+_RETRYABLE_STATUSES = frozenset({429, 500, 502, 503, 504})
+_RETRY_ATTEMPTS = 3
+_RETRY_BASE_DELAY = 0.5  # seconds
+_RETRY_MAX_DELAY = 8.0  # seconds
+
+
+class _RetryableProviderError(Exception):
+    """Transient provider failure (429/5xx) worth retrying in place."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header; HTTP-date form is treated as absent."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
+
+# Connection pre-warming: a HEAD to each provider origin at startup pays
+# the TCP+TLS handshake before the first user request, and re-warming
+# just inside the keepalive window keeps the sockets from going cold.
+_KEEPALIVE_EXPIRY = 60.0  # seconds
+_PREWARM_INTERVAL = _KEEPALIVE_EXPIRY - 10.0
+_PREWARM_URLS: Tuple[str, ...] = (
+    "https://api.openai.com",
+    "https://generativelanguage.googleapis.com",
+    "https://api.anthropic.com",
+    "https://api.together.xyz",
+    "https://api.fireworks.ai",
+    "https://api.cohere.ai",
+    "https://api.groq.com",
+)
+
+# Default model per provider, frozen once instead of rebuilt per call.
+_DEFAULT_MODELS = MappingProxyType({
+    ProviderEnum.OPENAI: "gpt-3.5-turbo",
+    ProviderEnum.GOOGLE: "gemini-1.5-flash",
+    ProviderEnum.ANTHROPIC: "claude-3-haiku",
+    ProviderEnum.TOGETHER: "meta-llama/Llama-2-70b-chat-hf",
+    ProviderEnum.FIREWORKS: "accounts/fireworks/models/llama-v2-70b-chat",
+    ProviderEnum.COHERE: "command",
+    ProviderEnum.GROQ: "llama2-70b-4096",
+})
+
+
+class _BatchQueue:
+    """Coalesce back-to-back provider calls into gathered bursts.
+
+    Completions from concurrent editor sessions arrive back to back.
+    Rather than dispatching each the instant it lands, calls to the same
+    (provider, model) pair collect for a short window — or until the
+    batch fills — and go out as a single asyncio.gather burst, which
+    amortizes event-loop wakeups and keeps the burst multiplexed on the
+    shared HTTP/2 connection. A semaphore caps total in-flight provider
+    calls so a burst cannot stampede the pool.
+    """
+
+    def __init__(self, dispatch):
+        # dispatch has the _call_provider signature:
+        # (provider, messages, model, api_key, temperature) -> str
+        self._dispatch = dispatch
+        self._queues: Dict[Tuple[str, str], asyncio.Queue] = {}
+        self._drainers: Dict[Tuple[str, str], asyncio.Task] = {}
+        self._bursts: set = set()
+        self._slots = asyncio.Semaphore(_BATCH_MAX_CONCURRENCY)
+
+    async def submit(
+        self,
+        provider: ProviderEnum,
+        messages: List[Dict],
+        model: str,
+        api_key: str,
+        temperature: float,
+    ) -> str:
+        """Enqueue one call and wait for its individual result."""
+        key = (provider.value, model)
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = self._queues[key] = asyncio.Queue()
+            self._drainers[key] = asyncio.create_task(self._drain(queue))
+        future = asyncio.get_running_loop().create_future()
+        await queue.put(((provider, messages, model, api_key, temperature), future))
+        return await future
+
+    async def _drain(self, queue: asyncio.Queue):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await queue.get()]
+            deadline = loop.time() + _BATCH_WINDOW
+            while len(batch) < _BATCH_MAX_SIZE:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            # Launch the burst without blocking the next collection
+            # window; the semaphore bounds overall concurrency.
+            burst = asyncio.create_task(self._run_batch(batch))
+            self._bursts.add(burst)
+            burst.add_done_callback(self._bursts.discard)
+
+    async def _run_batch(self, batch):
+        async def one(args, future):
+            if future.cancelled():
+                return
+            async with self._slots:
+                try:
+                    result = await self._dispatch(*args)
+                except Exception as exc:
+                    if not future.cancelled():
+                        future.set_exception(exc)
+                else:
+                    if not future.cancelled():
+                        future.set_result(result)
+
+        await asyncio.gather(
+            *(one(args, future) for args, future in batch),
+            return_exceptions=True,
+        )
+
+    def close(self):
+        """Cancel the background drainers; called from app shutdown."""
+        for task in self._drainers.values():
+            task.cancel()
+        for task in self._bursts:
+            task.cancel()
+        self._drainers.clear()
+        self._queues.clear()
+
+
 class MultiProviderAIService:
     """AI service that can use multiple providers based on user API keys."""
     
     def __init__(self):
-        self.session: Optional[aiohttp.ClientSession] = None
+        self.client: Optional[httpx.AsyncClient] = None
+        self._client_lock = asyncio.Lock()
         self.api_key_manager: Optional[APIKeyManager] = None
-        
+        self.response_cache = LLMCache()
+        self.semantic_cache = NearDuplicateCache()
+        self._batch = _BatchQueue(self._call_provider)
+        # Maps user_id -> (expiry, frozenset of provider values with keys).
+        self._provider_cache: Dict[int, Tuple[float, frozenset]] = {}
+        APIKeyManager.register_mutation_hook(self._invalidate_provider_cache)
+        # Maps provider -> {"success_ewma", "ewma_latency", "last_failure_ts"}.
+        self._provider_stats: Dict[ProviderEnum, Dict[str, float]] = {}
+        self._global_sem = asyncio.Semaphore(_GLOBAL_INFLIGHT_LIMIT)
+        self._prewarm_task: Optional[asyncio.Task] = None
+        # Bound-method dispatch table; adding a provider is one entry
+        # instead of another branch in _call_provider.
+        self._provider_calls = {
+            ProviderEnum.GOOGLE: self._call_google,
+            ProviderEnum.ANTHROPIC: self._call_anthropic,
+            ProviderEnum.COHERE: self._call_cohere,
+        }
+        for provider, (label, url) in _OPENAI_COMPATIBLE.items():
+            self._provider_calls[provider] = partial(
+                self._call_openai_compatible, label, url
+            )
+        self._user_sems: Dict[int, asyncio.Semaphore] = {}
+        self._inflight_by_user: Dict[int, int] = {}
+
+    @asynccontextmanager
+    async def _llm_slot(self, user_id: Optional[int]):
+        """Hold a per-user and global slot for one outbound LLM call.
+
+        The per-user semaphore is taken first so a user at their limit
+        queues without occupying global capacity.
+        """
+        if user_id is None:
+            yield
+            return
+        sem = self._user_sems.get(user_id)
+        if sem is None:
+            # Bound the table; clearing only forgets idle users' limits
+            # momentarily since holders keep their semaphore reference.
+            if len(self._user_sems) >= _PROVIDER_CACHE_MAXSIZE:
+                self._user_sems.clear()
+            sem = self._user_sems.setdefault(
+                user_id, asyncio.Semaphore(_USER_INFLIGHT_LIMIT)
+            )
+        async with sem:
+            async with self._global_sem:
+                self._inflight_by_user[user_id] = (
+                    self._inflight_by_user.get(user_id, 0) + 1
+                )
+                try:
+                    yield
+                finally:
+                    left = self._inflight_by_user[user_id] - 1
+                    if left:
+                        self._inflight_by_user[user_id] = left
+                    else:
+                        del self._inflight_by_user[user_id]
+
+    def get_inflight_stats(self) -> Dict[str, Any]:
+        """Snapshot of in-flight LLM calls, for inspecting load."""
+        return {
+            "total": sum(self._inflight_by_user.values()),
+            "per_user": dict(self._inflight_by_user),
+            "per_user_limit": _USER_INFLIGHT_LIMIT,
+            "global_limit": _GLOBAL_INFLIGHT_LIMIT,
+        }
+
+    def _record_success(self, provider: ProviderEnum, elapsed: float) -> None:
+        stats = self._provider_stats.setdefault(
+            provider,
+            {"success_ewma": 1.0, "ewma_latency": elapsed,
+             "last_failure_ts": 0.0},
+        )
+        stats["success_ewma"] = (
+            (1 - _SUCCESS_ALPHA) * stats["success_ewma"] + _SUCCESS_ALPHA
+        )
+        stats["ewma_latency"] = (
+            (1 - _LATENCY_ALPHA) * stats["ewma_latency"]
+            + _LATENCY_ALPHA * elapsed
+        )
+
+    def _record_failure(self, provider: ProviderEnum) -> None:
+        stats = self._provider_stats.setdefault(
+            provider,
+            {"success_ewma": 1.0, "ewma_latency": 0.0, "last_failure_ts": 0.0},
+        )
+        stats["success_ewma"] = (1 - _SUCCESS_ALPHA) * stats["success_ewma"]
+        stats["last_failure_ts"] = time.monotonic()
+
+    def _provider_sort_key(self, provider: ProviderEnum) -> Tuple:
+        """Order providers healthiest-first for the failover loop.
+
+        A recent failure pushes the provider behind every healthy one
+        (simple circuit breaker); otherwise higher success EWMA wins,
+        with observed latency as the tiebreaker. Unknown providers rank
+        as healthy so new keys get traffic immediately.
+        """
+        stats = self._provider_stats.get(provider)
+        if stats is None:
+            return (0, -1.0, 0.0)
+        cooling = (
+            time.monotonic() - stats["last_failure_ts"] < _FAILURE_COOLDOWN
+        )
+        return (
+            1 if cooling else 0,
+            -stats["success_ewma"],
+            stats["ewma_latency"],
+        )
+
+    def _invalidate_provider_cache(self, user_id: int) -> None:
+        """Drop the cached provider list when a user's keys change."""
+        self._provider_cache.pop(user_id, None)
+
+    async def _get_client(self) -> httpx.AsyncClient:
+        """Create the shared client on first use (double-checked lock).
+
+        One pooled HTTP/2 client serves the process lifetime: provider
+        calls reuse warm TLS connections, and H2 multiplexing lets a burst
+        of concurrent generations share a single connection per provider
+        instead of queueing behind the pool. Generations run long, hence
+        the generous total timeout.
+        """
+        if self.client is None or self.client.is_closed:
+            async with self._client_lock:
+                if self.client is None or self.client.is_closed:
+                    self.client = httpx.AsyncClient(
+                        http2=True,
+                        limits=httpx.Limits(
+                            max_connections=2000,
+                            max_keepalive_connections=500,
+                            keepalive_expiry=_KEEPALIVE_EXPIRY
+                        ),
+                        timeout=httpx.Timeout(120.0, connect=10.0)
+                    )
+        return self.client
+
+    async def startup(self):
+        """Build the shared client eagerly; called from app startup.
+
+        Dependency injection hands out the module-level instance without
+        ever entering the async context, so the client must exist before
+        the first provider call.
+        """
+        await self._get_client()
+        if self._prewarm_task is None or self._prewarm_task.done():
+            self._prewarm_task = asyncio.create_task(self._prewarm_loop())
+
+    async def _prewarm_connections(self):
+        """HEAD every provider origin to populate the connection pool."""
+        async def warm(url: str):
+            try:
+                await self.client.head(url, timeout=5.0)
+            except Exception:
+                # Any response (even 4xx) leaves a warm socket behind;
+                # network errors just mean no pre-warmed connection.
+                pass
+
+        await asyncio.gather(*(warm(url) for url in _PREWARM_URLS))
+
+    async def _prewarm_loop(self):
+        """Keep provider connections warm for the process lifetime."""
+        while True:
+            await self._prewarm_connections()
+            await asyncio.sleep(_PREWARM_INTERVAL)
+
     async def __aenter__(self):
-        self.session = aiohttp.ClientSession()
+        # Entering no longer builds a throwaway client; it just ensures the
+        # shared one exists, and exiting leaves it open for other callers.
+        await self._get_client()
         return self
-        
+
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        if self.session:
-            await self.session.close()
+        pass
+
+    async def close(self):
+        """Close the shared client; called from app shutdown."""
+        if self._prewarm_task is not None:
+            self._prewarm_task.cancel()
+            self._prewarm_task = None
+        self._batch.close()
+        if self.client and not self.client.is_closed:
+            await self.client.aclose()
+        self.client = None
     
     def set_api_key_manager(self, manager: APIKeyManager):
         """Set the API key manager for this service."""
         self.api_key_manager = manager
     
     async def _get_available_providers(self, user_id: int) -> List[Tuple[ProviderEnum, UserAPIKey]]:
-        """Get available providers for a user."""
+        """Get available providers for a user.
+
+        The set of providers a user has keys for is cached briefly, so
+        the hot path only fetches keys for providers known to have one
+        instead of probing all of them on every call. Key rows are still
+        fetched fresh each time (the manager has its own PK-level cache),
+        keeping limit checks accurate.
+        """
         if not self.api_key_manager:
             raise ValueError("API key manager not set")
-        
+
+        now = time.monotonic()
+        cached = self._provider_cache.get(user_id)
+        if cached is not None and now < cached[0]:
+            candidates = [p for p in _ALL_PROVIDERS if p.value in cached[1]]
+        else:
+            cached = None
+            candidates = _ALL_PROVIDERS
+
         available_providers = []
-        for provider in ProviderEnum:
+        for provider in candidates:
             key = self.api_key_manager.get_available_api_key(user_id, provider)
             if key:
                 available_providers.append((provider, key))
-        
+
+        if cached is None:
+            if len(self._provider_cache) >= _PROVIDER_CACHE_MAXSIZE:
+                self._provider_cache.clear()
+            self._provider_cache[user_id] = (
+                now + _PROVIDER_CACHE_TTL,
+                frozenset(p.value for p, _ in available_providers),
+            )
+
+        # Healthiest provider first, so a degraded one stops being the
+        # default primary the whole process keeps timing out on.
+        available_providers.sort(key=lambda pair: self._provider_sort_key(pair[0]))
         return available_providers
     
-    async def _call_openai(self, messages: List[Dict], model: str, api_key: str, temperature: float = 0.7) -> str:
-        """Call OpenAI API."""
-        url = "https://api.openai.com/v1/chat/completions"
+    async def _call_openai_compatible(
+        self, label: str, url: str, messages: List[Dict], model: str,
+        api_key: str, temperature: float = 0.7
+    ) -> str:
+        """Call any provider speaking the OpenAI chat-completions schema."""
         headers = {
             "Authorization": f"Bearer {api_key}",
             "Content-Type": "application/json"
         }
-        
+
         data = {
             "model": model,
             "messages": messages,
             "temperature": temperature,
             "max_tokens": 4000
         }
-        
-        async with self.session.post(url, headers=headers, json=data) as response:
-            if response.status != 200:
-                error_text = await response.text()
-                logger.error(f"OpenAI API error: {response.status} - {error_text}")
-                raise Exception(f"OpenAI API error: {response.status}")
-            
-            result = await response.json()
-            return result["choices"][0]["message"]["content"]
-    
+
+        response = await self.client.post(
+            url, headers=headers, content=orjson.dumps(data)
+        )
+        if response.status_code != 200:
+            logger.error(f"{label} API error: {response.status_code} - {response.text}")
+            if response.status_code in _RETRYABLE_STATUSES:
+                raise _RetryableProviderError(
+                    f"{label} API error: {response.status_code}",
+                    retry_after=_parse_retry_after(
+                        response.headers.get("Retry-After")
+                    ),
+                )
+            raise Exception(f"{label} API error: {response.status_code}")
+
+        result = orjson.loads(response.content)
+        return result["choices"][0]["message"]["content"]
+
+    async def _call_openai_stream(
+        self, messages: List[Dict], model: str, api_key: str,
+        temperature: float = 0.7
+    ) -> AsyncIterator[str]:
+        """Stream tokens from the OpenAI API as they are generated."""
+        url = "https://api.openai.com/v1/chat/completions"
+        headers = {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json"
+        }
+
+        data = {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": 4000,
+            "stream": True
+        }
+
+        async with self.client.stream(
+            "POST", url, headers=headers, content=orjson.dumps(data)
+        ) as response:
+            if response.status_code != 200:
+                body = await response.aread()
+                logger.error(
+                    f"OpenAI API error: {response.status_code} - {body!r}"
+                )
+                raise Exception(f"OpenAI API error: {response.status_code}")
+
+            async for line in response.aiter_lines():
+                if not line.startswith("data: "):
+                    continue
+                payload = line[6:]
+                if payload == "[DONE]":
+                    break
+                frame = orjson.loads(payload)
+                delta = frame["choices"][0].get("delta", {})
+                token = delta.get("content")
+                if token:
+                    yield token
+
     async def _call_google(self, messages: List[Dict], model: str, api_key: str, temperature: float = 0.7) -> str:
         """Call Google Gemini API."""
         url = f"https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent"
@@ -130,14 +701,25 @@ class MultiProviderAIService:
             }
         }
         
-        async with self.session.post(url, params=params, json=data) as response:
-            if response.status != 200:
-                error_text = await response.text()
-                logger.error(f"Google API error: {response.status} - {error_text}")
-                raise Exception(f"Google API error: {response.status}")
-            
-            result = await response.json()
-            return result["candidates"][0]["content"]["parts"][0]["text"]
+        response = await self.client.post(
+            url,
+            params=params,
+            headers={"Content-Type": "application/json"},
+            content=orjson.dumps(data),
+        )
+        if response.status_code != 200:
+            logger.error(f"Google API error: {response.status_code} - {response.text}")
+            if response.status_code in _RETRYABLE_STATUSES:
+                raise _RetryableProviderError(
+                    f"Google API error: {response.status_code}",
+                    retry_after=_parse_retry_after(
+                        response.headers.get("Retry-After")
+                    ),
+                )
+            raise Exception(f"Google API error: {response.status_code}")
+
+        result = orjson.loads(response.content)
+        return result["candidates"][0]["content"]["parts"][0]["text"]
     
     async def _call_anthropic(self, messages: List[Dict], model: str, api_key: str, temperature: float = 0.7) -> str:
         """Call Anthropic Claude API."""
@@ -145,7 +727,8 @@ class MultiProviderAIService:
         headers = {
             "x-api-key": api_key,
             "Content-Type": "application/json",
-            "anthropic-version": "2023-06-01"
+            "anthropic-version": "2023-06-01",
+            "anthropic-beta": "prompt-caching-2024-07-31"
         }
         
         # Convert messages to Claude format
@@ -169,64 +752,87 @@ class MultiProviderAIService:
         }
         
         if system_message:
-            data["system"] = system_message
-        
-        async with self.session.post(url, headers=headers, json=data) as response:
-            if response.status != 200:
-                error_text = await response.text()
-                logger.error(f"Anthropic API error: {response.status} - {error_text}")
-                raise Exception(f"Anthropic API error: {response.status}")
-            
-            result = await response.json()
-            return result["content"][0]["text"]
-    
-    async def _call_together(self, messages: List[Dict], model: str, api_key: str, temperature: float = 0.7) -> str:
-        """Call Together AI API."""
-        url = "https://api.together.xyz/v1/chat/completions"
-        headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json"
-        }
+            # Mark the system block cacheable so Claude reuses the prefix
+            # KV state across calls instead of re-reading it every time.
+            data["system"] = [{
+                "type": "text",
+                "text": system_message,
+                "cache_control": {"type": "ephemeral"}
+            }]
         
-        data = {
-            "model": model,
-            "messages": messages,
-            "temperature": temperature,
-            "max_tokens": 4000
-        }
-        
-        async with self.session.post(url, headers=headers, json=data) as response:
-            if response.status != 200:
-                error_text = await response.text()
-                logger.error(f"Together API error: {response.status} - {error_text}")
-                raise Exception(f"Together API error: {response.status}")
-            
-            result = await response.json()
-            return result["choices"][0]["message"]["content"]
-    
-    async def _call_fireworks(self, messages: List[Dict], model: str, api_key: str, temperature: float = 0.7) -> str:
-        """Call Fireworks AI API."""
-        url = "https://api.fireworks.ai/inference/v1/chat/completions"
+        response = await self.client.post(
+            url, headers=headers, content=orjson.dumps(data)
+        )
+        if response.status_code != 200:
+            logger.error(f"Anthropic API error: {response.status_code} - {response.text}")
+            if response.status_code in _RETRYABLE_STATUSES:
+                raise _RetryableProviderError(
+                    f"Anthropic API error: {response.status_code}",
+                    retry_after=_parse_retry_after(
+                        response.headers.get("Retry-After")
+                    ),
+                )
+            raise Exception(f"Anthropic API error: {response.status_code}")
+
+        result = orjson.loads(response.content)
+        return result["content"][0]["text"]
+
+    async def _call_anthropic_stream(
+        self, messages: List[Dict], model: str, api_key: str,
+        temperature: float = 0.7
+    ) -> AsyncIterator[str]:
+        """Stream tokens from the Anthropic API as they are generated."""
+        url = "https://api.anthropic.com/v1/messages"
         headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json"
+            "x-api-key": api_key,
+            "Content-Type": "application/json",
+            "anthropic-version": "2023-06-01",
+            "anthropic-beta": "prompt-caching-2024-07-31"
         }
-        
+
+        system_message = ""
+        claude_messages = []
+        for message in messages:
+            if message["role"] == "system":
+                system_message = message["content"]
+            else:
+                claude_messages.append({
+                    "role": message["role"],
+                    "content": message["content"]
+                })
+
         data = {
             "model": model,
-            "messages": messages,
+            "max_tokens": 4000,
             "temperature": temperature,
-            "max_tokens": 4000
+            "messages": claude_messages,
+            "stream": True
         }
-        
-        async with self.session.post(url, headers=headers, json=data) as response:
-            if response.status != 200:
-                error_text = await response.text()
-                logger.error(f"Fireworks API error: {response.status} - {error_text}")
-                raise Exception(f"Fireworks API error: {response.status}")
-            
-            result = await response.json()
-            return result["choices"][0]["message"]["content"]
+        if system_message:
+            data["system"] = [{
+                "type": "text",
+                "text": system_message,
+                "cache_control": {"type": "ephemeral"}
+            }]
+
+        async with self.client.stream(
+            "POST", url, headers=headers, content=orjson.dumps(data)
+        ) as response:
+            if response.status_code != 200:
+                body = await response.aread()
+                logger.error(
+                    f"Anthropic API error: {response.status_code} - {body!r}"
+                )
+                raise Exception(f"Anthropic API error: {response.status_code}")
+
+            async for line in response.aiter_lines():
+                if not line.startswith("data: "):
+                    continue
+                frame = orjson.loads(line[6:])
+                if frame.get("type") == "content_block_delta":
+                    token = frame["delta"].get("text")
+                    if token:
+                        yield token
     
     async def _call_cohere(self, messages: List[Dict], model: str, api_key: str, temperature: float = 0.7) -> str:
         """Call Cohere API."""
@@ -259,71 +865,241 @@ class MultiProviderAIService:
             "max_tokens": 4000
         }
         
-        async with self.session.post(url, headers=headers, json=data) as response:
-            if response.status != 200:
-                error_text = await response.text()
-                logger.error(f"Cohere API error: {response.status} - {error_text}")
-                raise Exception(f"Cohere API error: {response.status}")
-            
-            result = await response.json()
-            return result["text"]
-    
-    async def _call_groq(self, messages: List[Dict], model: str, api_key: str, temperature: float = 0.7) -> str:
-        """Call Groq API."""
-        url = "https://api.groq.com/openai/v1/chat/completions"
-        headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json"
-        }
-        
-        data = {
-            "model": model,
-            "messages": messages,
-            "temperature": temperature,
-            "max_tokens": 4000
-        }
-        
-        async with self.session.post(url, headers=headers, json=data) as response:
-            if response.status != 200:
-                error_text = await response.text()
-                logger.error(f"Groq API error: {response.status} - {error_text}")
-                raise Exception(f"Groq API error: {response.status}")
-            
-            result = await response.json()
-            return result["choices"][0]["message"]["content"]
+        response = await self.client.post(
+            url, headers=headers, content=orjson.dumps(data)
+        )
+        if response.status_code != 200:
+            logger.error(f"Cohere API error: {response.status_code} - {response.text}")
+            if response.status_code in _RETRYABLE_STATUSES:
+                raise _RetryableProviderError(
+                    f"Cohere API error: {response.status_code}",
+                    retry_after=_parse_retry_after(
+                        response.headers.get("Retry-After")
+                    ),
+                )
+            raise Exception(f"Cohere API error: {response.status_code}")
+
+        result = orjson.loads(response.content)
+        return result["text"]
     
     async def _call_provider(self, provider: ProviderEnum, messages: List[Dict], model: str, api_key: str, temperature: float = 0.7) -> str:
-        """Call the appropriate provider API."""
+        """Call the appropriate provider API, recording health signals."""
+        call = self._provider_calls.get(provider)
+        if call is None:
+            raise ValueError(f"Unsupported provider: {provider}")
+        await self._get_client()
+        start = time.monotonic()
+        try:
+            for attempt in range(1, _RETRY_ATTEMPTS + 1):
+                try:
+                    result = await call(messages, model, api_key, temperature)
+                    break
+                except _RetryableProviderError as e:
+                    if attempt == _RETRY_ATTEMPTS:
+                        raise
+                    delay = min(
+                        _RETRY_BASE_DELAY * 2 ** (attempt - 1),
+                        _RETRY_MAX_DELAY,
+                    )
+                    # Jitter decorrelates retries from concurrent calls
+                    # hitting the same degraded endpoint.
+                    delay = random.uniform(delay / 2, delay)
+                    if e.retry_after is not None:
+                        delay = max(delay, e.retry_after)
+                    logger.warning(
+                        f"Transient error from {provider}, retrying in "
+                        f"{delay:.1f}s (attempt {attempt}/{_RETRY_ATTEMPTS}): {e}"
+                    )
+                    await asyncio.sleep(delay)
+        except Exception:
+            self._record_failure(provider)
+            raise
+        self._record_success(provider, time.monotonic() - start)
+        return result
+
+    async def _stream_provider(
+        self,
+        provider: ProviderEnum,
+        messages: List[Dict],
+        model: str,
+        api_key: str,
+        temperature: float = 0.7
+    ) -> AsyncIterator[str]:
+        """Stream from a provider, falling back to one buffered chunk.
+
+        OpenAI and Anthropic expose SSE streaming; the remaining
+        providers yield their full buffered response as a single chunk
+        so callers can treat every provider as a token stream.
+        """
+        await self._get_client()
         if provider == ProviderEnum.OPENAI:
-            return await self._call_openai(messages, model, api_key, temperature)
-        elif provider == ProviderEnum.GOOGLE:
-            return await self._call_google(messages, model, api_key, temperature)
+            async for token in self._call_openai_stream(
+                messages, model, api_key, temperature
+            ):
+                yield token
         elif provider == ProviderEnum.ANTHROPIC:
-            return await self._call_anthropic(messages, model, api_key, temperature)
-        elif provider == ProviderEnum.TOGETHER:
-            return await self._call_together(messages, model, api_key, temperature)
-        elif provider == ProviderEnum.FIREWORKS:
-            return await self._call_fireworks(messages, model, api_key, temperature)
-        elif provider == ProviderEnum.COHERE:
-            return await self._call_cohere(messages, model, api_key, temperature)
-        elif provider == ProviderEnum.GROQ:
-            return await self._call_groq(messages, model, api_key, temperature)
+            async for token in self._call_anthropic_stream(
+                messages, model, api_key, temperature
+            ):
+                yield token
         else:
-            raise ValueError(f"Unsupported provider: {provider}")
-    
+            yield await self._call_provider(
+                provider, messages, model, api_key, temperature
+            )
+
+    async def _stream_with_failover(
+        self,
+        available_providers: List[Tuple[ProviderEnum, UserAPIKey]],
+        messages: List[Dict],
+        temperature: float,
+        operation: str = "generation",
+        user_id: Optional[int] = None
+    ) -> AsyncIterator[str]:
+        """Yield tokens from the first provider that starts answering.
+
+        Failover only happens before the first token: once output has
+        reached the caller a mid-stream error must propagate, since
+        switching providers would splice two unrelated answers.
+        """
+        async with self._llm_slot(user_id):
+            for provider, api_key in available_providers:
+                model = self._get_model_for_provider(provider)
+                started = False
+                try:
+                    async for token in self._stream_provider(
+                        provider, messages, model, api_key.api_key, temperature
+                    ):
+                        started = True
+                        yield token
+                    self.api_key_manager.update_key_usage(str(api_key.id), 1)
+                    return
+                except Exception as e:
+                    if started:
+                        raise
+                    logger.warning(
+                        f"Provider {provider} failed for {operation}: {e}"
+                    )
+
+        raise Exception(f"All available providers failed for {operation}")
+
     def _get_model_for_provider(self, provider: ProviderEnum) -> str:
         """Get the default model for a provider."""
-        model_map = {
-            ProviderEnum.OPENAI: "gpt-3.5-turbo",
-            ProviderEnum.GOOGLE: "gemini-1.5-flash",
-            ProviderEnum.ANTHROPIC: "claude-3-haiku",
-            ProviderEnum.TOGETHER: "meta-llama/Llama-2-70b-chat-hf",
-            ProviderEnum.FIREWORKS: "accounts/fireworks/models/llama-v2-70b-chat",
-            ProviderEnum.COHERE: "command",
-            ProviderEnum.GROQ: "llama2-70b-4096"
-        }
-        return model_map.get(provider, "gpt-3.5-turbo")
+        return _DEFAULT_MODELS.get(provider, "gpt-3.5-turbo")
     
+    async def _generate_with_failover(
+        self,
+        available_providers: List[Tuple[ProviderEnum, UserAPIKey]],
+        messages: List[Dict],
+        temperature: float,
+        operation: str = "generation",
+        batch: bool = False,
+        user_id: Optional[int] = None,
+        fuzzy_scope: Optional[Tuple] = None
+    ) -> str:
+        """Run the provider failover loop, replaying cached responses.
+
+        Near-deterministic calls (temperature at or below
+        CACHEABLE_TEMPERATURE) are cached by the full message list, so a
+        repeat analysis of unchanged code skips the provider entirely. The
+        key is provider-agnostic on purpose: with failover, any provider's
+        answer to an identical prompt is an acceptable replay.
+
+        The fuzzy tier only runs when the caller supplies a
+        ``fuzzy_scope``: similarity over prompt lines cannot tell a
+        readability refactor from a performance one (or one user's file
+        from another's near-copy), so the user, the operation and its
+        parameters must match exactly before line similarity is even
+        considered.
+        """
+        cache_key = None
+        prompt_text = None
+        if temperature <= CACHEABLE_TEMPERATURE:
+            cache_key = LLMCache.make_messages_key(messages, "multi", temperature)
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+            if fuzzy_scope is not None:
+                # Second tier: a near-identical prompt (same file, one
+                # line edited) can replay the previous answer without a
+                # model call.
+                prompt_text = "\n".join(m["content"] for m in messages)
+                cached = self.semantic_cache.get(prompt_text, fuzzy_scope)
+                if cached is not None:
+                    return cached
+
+        async with self._llm_slot(user_id):
+            response, api_key = await self._hedged_call(
+                available_providers, messages, temperature,
+                operation=operation, batch=batch
+            )
+
+        # Update usage statistics
+        self.api_key_manager.update_key_usage(str(api_key.id), 1)
+
+        if cache_key is not None:
+            self.response_cache.set(cache_key, response)
+            if prompt_text is not None:
+                self.semantic_cache.set(prompt_text, response, fuzzy_scope)
+        return response
+
+    async def _hedged_call(
+        self,
+        available_providers: List[Tuple[ProviderEnum, UserAPIKey]],
+        messages: List[Dict],
+        temperature: float,
+        stagger: float = 5.0,
+        operation: str = "generation",
+        batch: bool = False
+    ) -> Tuple[str, UserAPIKey]:
+        """Race providers with staggered starts; first success wins.
+
+        The preferred provider starts immediately; if it has neither
+        answered nor failed within ``stagger`` seconds the next one is
+        launched as a hedge (failures launch the next eagerly). The first
+        successful response cancels everything still in flight, so a hung
+        primary costs one stagger interval instead of its full timeout.
+        """
+        remaining = list(available_providers)
+        pending: set = set()
+        task_keys: Dict[asyncio.Task, Tuple[ProviderEnum, UserAPIKey]] = {}
+
+        def _launch():
+            provider, api_key = remaining.pop(0)
+            model = self._get_model_for_provider(provider)
+            # High-frequency operations ride the micro-batch queue so
+            # back-to-back calls burst out together.
+            call = self._batch.submit if batch else self._call_provider
+            task = asyncio.create_task(
+                call(provider, messages, model, api_key.api_key, temperature)
+            )
+            task_keys[task] = (provider, api_key)
+            pending.add(task)
+
+        _launch()
+        while pending:
+            done, pending = await asyncio.wait(
+                pending,
+                timeout=stagger if remaining else None,
+                return_when=asyncio.FIRST_COMPLETED
+            )
+
+            for task in done:
+                provider, api_key = task_keys[task]
+                if task.exception() is None:
+                    for other in pending:
+                        other.cancel()
+                    return task.result(), api_key
+                logger.warning(
+                    f"Provider {provider} failed for {operation}: {task.exception()}"
+                )
+
+            # Hedge on timeout, or move on eagerly after failures.
+            if remaining:
+                _launch()
+
+        raise Exception(f"All available providers failed for {operation}")
+
     async def generate_code_suggestion(
         self,
         user_id: int,
@@ -339,40 +1115,25 @@ class MultiProviderAIService:
         if not available_providers:
             raise ValueError("No API keys available for AI services")
         
-        # Try providers in order of preference
-        for provider, api_key in available_providers:
-            try:
-                model = self._get_model_for_provider(provider)
-                
-                system_prompt = f"""You are an expert {language} developer. Provide helpful, accurate code suggestions.
-                Focus on best practices, performance, and maintainability.
-                Return only the code suggestion without markdown formatting."""
-                
-                messages = [
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": f"Code context:\n{code_context}"}
-                ]
-                
-                if user_prompt:
-                    messages.append({"role": "user", "content": f"User request: {user_prompt}"})
-                
-                suggestion = await self._call_provider(provider, messages, model, api_key.api_key, temperature=0.3)
-                
-                # Update usage statistics
-                self.api_key_manager.update_key_usage(str(api_key.id), 1)
-                
-                return CodeSuggestion(
-                    code=suggestion.strip(),
-                    explanation="AI-generated suggestion",
-                    confidence=0.8,
-                    language=language
-                )
-                
-            except Exception as e:
-                logger.warning(f"Provider {provider} failed: {e}")
-                continue
-        
-        raise Exception("All available providers failed")
+        messages = [
+            {"role": "system", "content": _system_prompt("suggest", language)},
+            {"role": "user", "content": f"Code context:\n{code_context}"}
+        ]
+
+        if user_prompt:
+            messages.append({"role": "user", "content": f"User request: {user_prompt}"})
+
+        suggestion = await self._generate_with_failover(
+            available_providers, messages, temperature=0.3,
+            operation="code suggestion", user_id=user_id
+        )
+
+        return CodeSuggestion(
+            code=suggestion.strip(),
+            explanation="AI-generated suggestion",
+            confidence=0.8,
+            language=language
+        )
     
     async def analyze_code(
         self,
@@ -388,79 +1149,45 @@ class MultiProviderAIService:
         if not available_providers:
             raise ValueError("No API keys available for AI services")
         
-        for provider, api_key in available_providers:
-            try:
-                model = self._get_model_for_provider(provider)
-                
-                system_prompt = f"""You are a senior {language} developer and code reviewer.
-                Analyze the provided code and return a JSON object with:
-                {{
-                    "suggestions": [
-                        {{
-                            "code": "improved code",
-                            "explanation": "explanation",
-                            "confidence": 0.8,
-                            "line_start": 1,
-                            "line_end": 5
-                        }}
-                    ],
-                    "bugs": [
-                        {{
-                            "line": 1,
-                            "type": "logic",
-                            "severity": "medium",
-                            "description": "issue description",
-                            "suggestion": "fix suggestion"
-                        }}
-                    ],
-                    "complexity": {{
-                        "total_lines": 50,
-                        "functions": 3,
-                        "complexity_score": 75,
-                        "maintainability": "high"
-                    }}
-                }}"""
-                
-                messages = [
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": f"Analyze this {language} code:\n\n{code}"}
-                ]
-                
-                response = await self._call_provider(provider, messages, model, api_key.api_key, temperature=0.1)
-                
-                # Update usage statistics
-                self.api_key_manager.update_key_usage(str(api_key.id), 1)
-                
-                try:
-                    analysis_result = json.loads(response)
-                    suggestions = []
-                    
-                    for suggestion_data in analysis_result.get("suggestions", []):
-                        suggestions.append(CodeSuggestion(
-                            code=suggestion_data.get("code", ""),
-                            explanation=suggestion_data.get("explanation", ""),
-                            confidence=suggestion_data.get("confidence", 0.8),
-                            language=language,
-                            line_start=suggestion_data.get("line_start"),
-                            line_end=suggestion_data.get("line_end")
-                        ))
-                    
-                    return suggestions
-                    
-                except json.JSONDecodeError:
-                    # Fallback to simple suggestion
-                    return [CodeSuggestion(
-                        code=response,
-                        explanation="AI code analysis",
-                        confidence=0.7,
-                        language=language
-                    )]
-                
-            except Exception as e:
-                logger.warning(f"Provider {provider} failed for analysis: {e}")
-                continue
-        
-        raise Exception("All available providers failed for code analysis")
+        messages = [
+            {"role": "system", "content": _system_prompt("analyze", language)},
+            {
+                "role": "user",
+                "content": (
+                    _ANALYZE_PREFIX.get(language)
+                    or f"Analyze this {language} code:\n\n"
+                ) + code,
+            }
+        ]
+
+        response = await self._generate_with_failover(
+            available_providers, messages, temperature=0.1,
+            operation="code analysis", user_id=user_id,
+            fuzzy_scope=(user_id, "analyze", language)
+        )
+
+        try:
+            analysis = _AnalysisResponse.model_validate_json(response)
+        except ValidationError:
+            # Fallback to simple suggestion
+            return [CodeSuggestion(
+                code=response,
+                explanation="AI code analysis",
+                confidence=0.7,
+                language=language
+            )]
+
+        return [
+            CodeSuggestion(
+                code=suggestion.code,
+                explanation=suggestion.explanation,
+                confidence=suggestion.confidence,
+                language=language,
+                line_start=suggestion.line_start,
+                line_end=suggestion.line_end
+            )
+            for suggestion in analysis.suggestions
+        ]
     
     async def complete_code(
         self,
@@ -476,35 +1203,28 @@ class MultiProviderAIService:
         if not available_providers:
             raise ValueError("No API keys available for AI services")
         
-        for provider, api_key in available_providers:
-            try:
-                model = self._get_model_for_provider(provider)
-                
-                system_prompt = f"""You are an expert {language} developer. Complete the given code.
-                Return only the completion without markdown formatting."""
-                
-                messages = [
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": f"Complete this {language} code:\n\n{prefix}"}
-                ]
-                
-                completion = await self._call_provider(provider, messages, model, api_key.api_key, temperature=0.3)
-                
-                # Update usage statistics
-                self.api_key_manager.update_key_usage(str(api_key.id), 1)
-                
-                return CodeSuggestion(
-                    code=completion.strip(),
-                    explanation="AI code completion",
-                    confidence=0.8,
-                    language=language
-                )
-                
-            except Exception as e:
-                logger.warning(f"Provider {provider} failed for completion: {e}")
-                continue
-        
-        raise Exception("All available providers failed for code completion")
+        messages = [
+            {"role": "system", "content": _system_prompt("complete", language)},
+            {
+                "role": "user",
+                "content": (
+                    _COMPLETE_PREFIX.get(language)
+                    or f"Complete this {language} code:\n\n"
+                ) + prefix,
+            }
+        ]
+
+        completion = await self._generate_with_failover(
+            available_providers, messages, temperature=0.3,
+            operation="code completion", batch=True, user_id=user_id
+        )
+
+        return CodeSuggestion(
+            code=completion.strip(),
+            explanation="AI code completion",
+            confidence=0.8,
+            language=language
+        )
     
     async def refactor_code(
         self,
@@ -519,35 +1239,28 @@ class MultiProviderAIService:
         if not available_providers:
             raise ValueError("No API keys available for AI services")
         
-        for provider, api_key in available_providers:
-            try:
-                model = self._get_model_for_provider(provider)
-                
-                system_prompt = f"""You are a senior {language} developer. Refactor the provided code with {refactoring_type} improvements.
-                Return only the refactored code without markdown formatting."""
-                
-                messages = [
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": f"Refactor this {language} code:\n\n{code}"}
-                ]
-                
-                refactored_code = await self._call_provider(provider, messages, model, api_key.api_key, temperature=0.2)
-                
-                # Update usage statistics
-                self.api_key_manager.update_key_usage(str(api_key.id), 1)
-                
-                return CodeSuggestion(
-                    code=refactored_code.strip(),
-                    explanation=f"AI code refactoring ({refactoring_type})",
-                    confidence=0.8,
-                    language=language
-                )
-                
-            except Exception as e:
-                logger.warning(f"Provider {provider} failed for refactoring: {e}")
-                continue
-        
-        raise Exception("All available providers failed for code refactoring")
+        messages = [
+            {"role": "system", "content": _system_prompt("refactor", language)},
+            {
+                "role": "user",
+                "content": f"Apply {refactoring_type} improvements. " + (
+                    _REFACTOR_PREFIX.get(language)
+                    or f"Refactor this {language} code:\n\n"
+                ) + code,
+            }
+        ]
+
+        refactored_code = await self._generate_with_failover(
+            available_providers, messages, temperature=0.2,
+            operation="code refactoring", user_id=user_id
+        )
+
+        return CodeSuggestion(
+            code=refactored_code.strip(),
+            explanation=f"AI code refactoring ({refactoring_type})",
+            confidence=0.8,
+            language=language
+        )
     
     async def explain_code(
         self,
@@ -562,30 +1275,79 @@ class MultiProviderAIService:
         if not available_providers:
             raise ValueError("No API keys available for AI services")
         
-        for provider, api_key in available_providers:
-            try:
-                model = self._get_model_for_provider(provider)
-                
-                system_prompt = f"""You are a senior {language} developer. Explain the provided code in {detail_level} detail.
-                Focus on what the code does, how it works, and any important concepts."""
-                
-                messages = [
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": f"Explain this {language} code:\n\n{code}"}
-                ]
-                
-                explanation = await self._call_provider(provider, messages, model, api_key.api_key, temperature=0.1)
-                
-                # Update usage statistics
-                self.api_key_manager.update_key_usage(str(api_key.id), 1)
-                
-                return explanation.strip()
-                
-            except Exception as e:
-                logger.warning(f"Provider {provider} failed for explanation: {e}")
-                continue
-        
-        raise Exception("All available providers failed for code explanation")
+        messages = [
+            {"role": "system", "content": _system_prompt("explain", language)},
+            {
+                "role": "user",
+                "content": (
+                    _EXPLAIN_PREFIX.get(language)
+                    or f"Explain this {language} code in "
+                ) + f"{detail_level} detail:\n\n" + code,
+            }
+        ]
+
+        explanation = await self._generate_with_failover(
+            available_providers, messages, temperature=0.1,
+            operation="code explanation", user_id=user_id,
+            fuzzy_scope=(user_id, "explain", language, detail_level)
+        )
+
+        return explanation.strip()
+
+    async def explain_code_stream(
+        self,
+        user_id: int,
+        code: str,
+        language: str,
+        detail_level: str = "medium"
+    ) -> AsyncIterator[str]:
+        """Stream a code explanation token by token.
+
+        Long explanations otherwise buffer for the full generation time
+        before the first byte reaches the editor; streaming brings time
+        to first token down to roughly network latency.
+        """
+        available_providers = await self._get_available_providers(user_id)
+        if not available_providers:
+            raise ValueError("No API keys available for AI services")
+
+        messages = [
+            {"role": "system", "content": _system_prompt("explain", language)},
+            {
+                "role": "user",
+                "content": (
+                    _EXPLAIN_PREFIX.get(language)
+                    or f"Explain this {language} code in "
+                ) + f"{detail_level} detail:\n\n" + code,
+            }
+        ]
+
+        async for token in self._stream_with_failover(
+            available_providers, messages, temperature=0.1,
+            operation="code explanation", user_id=user_id
+        ):
+            yield token
+
+    async def generate_text_stream(
+        self,
+        prompt: str,
+        user_id: int,
+        temperature: float = 0.7
+    ) -> AsyncIterator[str]:
+        """Stream generated text token by token."""
+        available_providers = await self._get_available_providers(user_id)
+        if not available_providers:
+            raise ValueError("No API keys available for AI services")
+
+        messages = [
+            {"role": "user", "content": prompt}
+        ]
+
+        async for token in self._stream_with_failover(
+            available_providers, messages, temperature,
+            operation="text generation", user_id=user_id
+        ):
+            yield token
 
     async def generate_text(
         self,
@@ -603,17 +1365,11 @@ class MultiProviderAIService:
         messages = [
             {"role": "user", "content": prompt}
         ]
-        
-        for provider, api_key in available_providers:
-            try:
-                model = self._get_model_for_provider(provider)
-                response = await self._call_provider(provider, messages, model, api_key, temperature)
-                return response
-            except Exception as e:
-                logger.warning(f"Provider {provider} failed: {str(e)}")
-                continue
-        
-        raise Exception("All available providers failed for text generation")
+
+        return await self._generate_with_failover(
+            available_providers, messages, temperature,
+            operation="text generation", batch=True, user_id=user_id
+        )
 
 
 # Global multi-provider AI service instance